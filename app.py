@@ -1,69 +1,113 @@
 import os
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash
+from flask import Flask, Blueprint, current_app, request, jsonify, render_template, session, redirect, url_for, flash
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from utils.auth import User, get_user, create_user
-from reportlab.pdfgen import canvas
+from utils.auth import User, AuthBusyError, authenticate, get_user, create_user, load_user_record
 from flask import send_file
 import io
-import webbrowser
-import threading
 
 # Importing utilities
-from utils.db import init_db, get_connection
-from utils.calculations import calculate_health_score, generate_alerts
-from utils.risk_logic import generate_risk_alerts  # Your new import!
-from utils.translations import LANGUAGES           # The language dictionary
-
-app = Flask(__name__)
-app.secret_key = os.environ.get("SECRET_KEY", "super_secret_business_key") # Required for language memory
-CORS(app)
+from utils.db import init_db, init_app, get_connection, get_pool_stats, insert_record
+from utils.aggregates import get_user_summary, get_user_overview, month_bounds
+from utils.cache import response_cache, page_cache
+from utils.trends import parse_trend_args, get_trends
+from utils.export import stream_export
+from utils.ingest import validate_record, parse_records, import_records, detect_format
+from utils.write_queue import IngestBusyError, write_queue
+from utils.events import EventsBusyError, broker
+from utils.forecasting import forecast_revenue, parse_forecast_args
+from utils.batch_health import get_user_health
+from utils.reports import submit_report, job_status, report_path
+from utils.risk_logic import generate_risk_alerts, monthly_risk_alerts  # Your new import!
+from utils.translations import LANGUAGES, get_catalog  # Compiled language catalogs
+from utils import assets, compression, metrics, series
+from utils.series import series_store
+
+# Every page and endpoint; create_app() registers it on the Flask app
+bp = Blueprint("main", __name__)
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = "login"
+login_manager.login_view = "main.login"
+
+def create_app():
+    """
+    Builds the Flask app. wsgi.py holds the instance gunicorn serves (gunicorn wsgi:app);
+    importing this module builds nothing.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get("SECRET_KEY", "super_secret_business_key") # Required for language memory
+    CORS(app)
+
+    login_manager.init_app(app)
+
+    # Return pooled database connections to the pool when each request ends
+    init_app(app)
+
+    # Per-route latency and SQL counts for /metrics; registered first so its timing includes the hooks below
+    metrics.init_app(app)
+
+    # Fingerprinted static URLs, and gzip/Brotli for JSON and HTML bodies
+    assets.init_app(app)
+    compression.init_app(app)
+
+    # Committed records are appended to the in-memory series behind /trends and /forecast
+    series.init_app(app)
 
-# Initialize the database on startup
-init_db()
+    # Creates and migrates the schema the first time a database is used; afterwards a single SELECT
+    init_db()
+
+    # Live updates carry the same /summary body, through the same cache entry
+    broker.snapshot = cached_summary
+
+    app.register_blueprint(bp)
+    return app
+
+def server_error():
+    """Logs the exception being handled and answers 500 without its text, which may hold internals."""
+    current_app.logger.exception("%s failed", request.path)
+    return jsonify({"error": "Internal server error"}), 500
 
 # --- Language Switching Logic ---
-@app.route("/set_lang/<lang>")
+@bp.route("/set_lang/<lang>")
 def set_lang(lang):
     """Saves the selected language to the user's session and reloads the page."""
     if lang in LANGUAGES:
         session['lang'] = lang
-    return redirect(request.referrer or url_for('home'))
+    return redirect(request.referrer or url_for('main.home'))
 
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = get_user(user_id)
-    if user_data:
-        return User(user_id)
-    return None
+    # Served from an in-memory TTL cache; the database is only hit on a miss
+    return load_user_record(user_id)
 
-@app.route("/login", methods=["GET","POST"])
+@bp.route("/login", methods=["GET","POST"])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     if request.method == "POST":
         username = request.form["username"]
         password = request.form["password"]
 
-        user_data = get_user(username)
-        if user_data and user_data["password"] == password:
+        try:
+            valid = authenticate(username, password)
+        except AuthBusyError as e:
+            flash(str(e))
+            return render_template("login.html"), 503
+
+        if valid:
             user = User(username)
             login_user(user)
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash("Invalid username or password.")
 
     return render_template("login.html")
 
-@app.route("/register", methods=["GET","POST"])
+@bp.route("/register", methods=["GET","POST"])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
 
     if request.method == "POST":
         username = request.form["username"]
@@ -75,305 +119,378 @@ def register():
         elif get_user(username):
             flash("Username already exists.")
         else:
-            if create_user(username, password):
+            try:
+                created = create_user(username, password)
+            except AuthBusyError as e:
+                flash(str(e))
+                return render_template("register.html"), 503
+            if created:
                 flash("Account created! Please login.")
-                return redirect(url_for('login'))
+                return redirect(url_for('main.login'))
             else:
                 flash("An error occurred. Please try again.")
 
     return render_template("register.html")
-@app.route("/dashboard")
+@bp.route("/dashboard")
 @login_required
 def dashboard():
     return render_template("dashboard.html")
 
-@app.route("/logout")
+@bp.route("/logout")
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('home'))
+    return redirect(url_for('main.home'))
 
-@app.context_processor
+@bp.app_context_processor
 def inject_translations():
     """Automatically injects the correct language dictionary into EVERY HTML page!"""
     lang = session.get('lang', 'en') # Default to English
-    return dict(t=LANGUAGES.get(lang, LANGUAGES['en']), current_lang=lang)
+    return dict(t=get_catalog(lang), current_lang=lang)
 # --------------------------------
 
-@app.route("/")
+@bp.route("/")
 def home():
     """Renders the landing page."""
-    return render_template("home.html")
+    return cached_page("home.html")
 
 # ADD DATA
-@app.route("/add-data", methods=["POST"])
+@bp.route("/add-data", methods=["POST"])
 @login_required
 def add_data():
     """Adds a new financial record with validation."""
     data = request.get_json()
-    
-    # Required fields validation
-    required = ["date", "revenue", "expenses", "inventory_cost"]
-    if not data or not all(k in data for k in required):
-        return jsonify({"error": f"Missing required fields: {required}"}), 400
+
+    # Same validation rules as bulk imports (see utils/ingest.py)
+    try:
+        date, rev, exp, inv, cat = validate_record(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Safer float conversion
-        rev = float(data.get("revenue") or 0)
-        exp = float(data.get("expenses") or 0)
-        inv = float(data.get("inventory_cost") or 0)
-        cat = data.get("category") or "General"
-        
-        # Inserts record including the optional 'category' field
-        cursor.execute("""
-            INSERT INTO business_data 
-            (user_id, date, revenue, expenses, inventory_cost, category)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            current_user.id,
-            data["date"],
-            rev,
-            exp,
-            inv,
-            cat
-        ))
-        conn.commit()
+        # Inserts the record (including the optional 'category' field) and updates the rollups,
+        # either right here or in the writer thread's next group commit (INGEST_MODE=queued)
+        committed = write_queue.write((current_user.id, date, rev, exp, inv, cat))
+    except IngestBusyError as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    except Exception:
+        return server_error()
+
+    if committed:
         return jsonify({"message": "Data recorded successfully", "status": "success"}), 201
-        
-    except ValueError:
-        return jsonify({"error": "Invalid numeric values provided"}), 400
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return jsonify({"message": "Data accepted", "status": "queued"}), 202
+
+@bp.route("/bulk-import", methods=["POST"])
+@login_required
+def bulk_import():
+    """
+    Imports many records at once from a CSV or JSON-array upload (multipart field 'file')
+    or request body. Rows are validated like /add-data; invalid rows are reported, not inserted.
+    """
+    upload = request.files.get("file")
+    if upload:
+        fmt = request.args.get("format") or detect_format(upload.filename, upload.mimetype)
+        stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    else:
+        fmt = request.args.get("format") or detect_format(mimetype=request.mimetype)
+        stream = io.StringIO(request.get_data(as_text=True), newline="")
+    if fmt is None:
+        return jsonify({"error": "Send a .csv or .json file, or pass ?format=csv|json"}), 400
+
+    progress = {"inserted": 0}
+    try:
+        result = import_records(current_user.id, parse_records(stream, fmt), progress=progress)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception:
+        return server_error()
     finally:
-        if 'conn' in locals():
-            conn.close()
+        # Derived data is invalidated once for the whole batch, even if it stopped part way
+        if progress["inserted"]:
+            version = response_cache.invalidate_user(current_user.id)
+            # Too many rows to push one by one; open dashboards refetch instead
+            broker.publish(current_user.id, "resync", {}, version)
+    status = 201 if result["inserted"] else 400
+    return jsonify(result), status
+
+def cached_json(endpoint, compute, *args):
+    """
+    Serves a per-user JSON endpoint through the response cache with a strong ETag.
+    A matching If-None-Match gets a 304 from the version lookup alone, before any query runs.
+    """
+    user_id = current_user.id
+    version = response_cache.version(user_id)
+    etag = response_cache.etag(user_id, endpoint, version, *args)
+    # Weak comparison, as If-None-Match requires; compressed responses carry a weak ETag
+    if request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag:
+        response = current_app.response_class(status=304)
+    else:
+        data = response_cache.get_or_compute(user_id, endpoint, compute, *args, version=version)
+        response = jsonify(data)
+    response.set_etag(etag)
+    # Browsers must revalidate, but may keep the body for the 304 path
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def cached_page(template, context=None, user_id=None):
+    """
+    Renders a template through the page cache, keyed by template, language and, when
+    user_id is given, that user's data version. context() builds the template
+    variables and only runs on a miss.
+    """
+    lang = session.get('lang', 'en')
+    version = response_cache.version(user_id) if user_id else 0
+    return page_cache.get_or_compute(
+        user_id, "page:" + template,
+        lambda: render_template(template, **(context() if context else {})),
+        lang, version=version,
+    )
 
 # SUMMARY
-@app.route("/summary", methods=["GET"])
+def summary_payload(user_id):
+    """Builds the /summary JSON body for a user."""
+    # Totals, category split and month-over-month growth come from one query
+    s = get_user_summary(user_id)
+    rev, exp, profit, margin = s["revenue"], s["expenses"], s["profit"], s["margin"]
+
+    # Served from the nightly health snapshot while it matches the current totals
+    _, health_score, alerts = get_user_health(user_id)
+
+    return {
+        "metrics": {
+            "total_revenue": round(rev, 2),
+            "total_expenses": round(exp, 2),
+            "total_inventory": round(s["inventory"], 2),
+            "net_profit": round(profit, 2),
+            "profit_margin": round(margin, 2),
+            "growth": round(s["growth"], 2)
+        },
+        "category_distribution": s["categories"],
+        "health_score": health_score,
+        "alerts": alerts
+    }
+
+def cached_summary(user_id):
+    """The /summary body through the response cache, for callers outside a request."""
+    return response_cache.get_or_compute(user_id, "summary", lambda: summary_payload(user_id), month_bounds()[0])
+
+@bp.route("/summary", methods=["GET"])
 @login_required
 def summary():
     """Calculates high-level business metrics, growth, and category distribution."""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # 1. Total Metrics
-        cursor.execute("""
-            SELECT SUM(revenue), SUM(expenses), SUM(inventory_cost) 
-            FROM business_data WHERE user_id = ?
-        """, (current_user.id,))
-        result = cursor.fetchone()
-        rev = result[0] or 0
-        exp = result[1] or 0
-        inv = result[2] or 0
-        profit = rev - exp
-        margin = (profit / rev * 100) if rev > 0 else 0
-        
-        # 2. Category Distribution
-        cursor.execute("""
-            SELECT category, SUM(revenue), SUM(expenses) 
-            FROM business_data WHERE user_id = ?
-            GROUP BY category
-        """, (current_user.id,))
-        cat_rows = cursor.fetchall()
-        category_distribution = [{"category": r[0], "revenue": r[1], "expenses": r[2]} for r in cat_rows]
-
-        # 3. Growth Calculation (Current Month vs Previous Month)
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        first_day_current = now.replace(day=1).strftime("%Y-%m-%d")
-        first_day_prev = (now.replace(day=1) - timedelta(days=1)).replace(day=1).strftime("%Y-%m-%d")
-        last_day_prev = (now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m-%d")
-
-        cursor.execute("SELECT SUM(revenue) FROM business_data WHERE user_id = ? AND date >= ?", (current_user.id, first_day_current))
-        current_month_rev = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT SUM(revenue) FROM business_data WHERE user_id = ? AND date >= ? AND date <= ?", (current_user.id, first_day_prev, last_day_prev))
-        prev_month_rev = cursor.fetchone()[0] or 0
-        
-        growth = ((current_month_rev - prev_month_rev) / prev_month_rev * 100) if prev_month_rev > 0 else 0
-
-        health_score = calculate_health_score(rev, exp, profit)
-        alerts = generate_alerts(rev, exp, profit, margin)
-
-        return jsonify({
-            "metrics": {
-                "total_revenue": round(rev, 2),
-                "total_expenses": round(exp, 2),
-                "total_inventory": round(inv, 2),
-                "net_profit": round(profit, 2),
-                "profit_margin": round(margin, 2),
-                "growth": round(growth, 2)
-            },
-            "category_distribution": category_distribution,
-            "health_score": health_score,
-            "alerts": alerts
-        })
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        # Growth depends on the calendar month, so it is part of the cache key
+        this_month = month_bounds()[0]
+        return cached_json("summary", lambda: summary_payload(current_user.id), this_month)
+    except Exception:
+        return server_error()
 
-@app.route("/forecast", methods=["GET"])
+@bp.route("/forecast", methods=["GET"])
 @login_required
 def forecast():
-    """Predicts next month's revenue using a simple moving average."""
+    """
+    Predicts revenue for the coming months from the monthly series.
+    ?model=sma|ses|linear|seasonal (default sma, 3-month moving average), ?horizon=1..24,
+    ?gaps=skip|zero (months without records left out, the default, or counted as 0).
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT revenue FROM business_data WHERE user_id = ? ORDER BY date DESC LIMIT 3", (current_user.id,))
-        rows = cursor.fetchall()
-        if not rows:
-            return jsonify({"forecast": 0})
-        
-        avg_rev = sum(r[0] for r in rows) / len(rows)
-        return jsonify({"forecast": round(avg_rev, 2)})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        model, horizon, gaps = parse_forecast_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # The fit ends with last month, so the key changes when a new month starts
+        this_month, _ = month_bounds()
+        return cached_json("forecast", lambda: forecast_revenue(current_user.id, model, horizon, gaps),
+                           model, horizon, gaps, this_month)
+    except Exception:
+        return server_error()
 
 # TRENDS
-@app.route("/trends", methods=["GET"])
+@bp.route("/trends", methods=["GET"])
 @login_required
 def trends():
-    """Returns historical data for charts."""
+    """
+    Returns historical data for charts.
+    Optional query parameters: start/end (date window), bucket=day|week|month,
+    points=N (LTTB reduction to N points), limit=N&cursor=... (keyset pages).
+    """
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT date, revenue, expenses, category FROM business_data WHERE user_id = ? ORDER BY date ASC", (current_user.id,))
-        rows = cursor.fetchall()
-        
-        data = [{"date": r[0], "revenue": r[1], "expenses": r[2], "category": r[3]} for r in rows]
-        return jsonify(data)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        opts = parse_trend_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        key = [opts[k] for k in ("start", "end", "bucket", "points", "limit", "cursor")]
+        return cached_json("trends", lambda: get_trends(current_user.id, opts), *key)
+    except Exception:
+        return server_error()
+
+@bp.route("/events")
+@login_required
+def events_stream():
+    """
+    Server-Sent Events for the current user: "update" after each committed record,
+    with the new records and refreshed summary, and "resync" when the client should refetch.
+    """
+    try:
+        sub = broker.subscribe(current_user.id)
+    except EventsBusyError as e:
+        return jsonify({"error": str(e)}), 503
+
+    response = current_app.response_class(broker.stream(sub), mimetype="text/event-stream")
+    # A client that leaves before the first chunk never starts the generator
+    response.call_on_close(lambda: broker.unsubscribe(sub))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+    return response
+
+@bp.route("/export", methods=["GET"])
+@login_required
+def export_data():
+    """Streams the user's full ledger as NDJSON or CSV (?format=csv), optionally gzipped (?compress=gzip)."""
+    fmt = request.args.get("format", "ndjson")
+    compress = request.args.get("compress") == "gzip"
+    try:
+        chunks, mimetype, filename = stream_export(current_user.id, fmt, compress)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-@app.route("/analytics")
+    response = current_app.response_class(chunks, mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "private, no-store"
+    return response
+
+@bp.route("/analytics")
 @login_required
 def analytics_page():
     """Renders the server-side analytics page."""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Calculate totals directly from the database for current user
-        cursor.execute("SELECT SUM(revenue), SUM(expenses) FROM business_data WHERE user_id = ?", (current_user.id,))
-        result = cursor.fetchone()
-        
-        rev = result[0] or 0
-        exp = result[1] or 0
-        profit = rev - exp
-        margin = round((profit / rev * 100), 2) if rev > 0 else 0
-        
+    def context():
+        s = get_user_overview(current_user.id)
+
         # Create the dictionary exactly as your HTML expects it
         summary_data = {
-            "revenue": round(rev, 2),
-            "expenses": round(exp, 2),
-            "profit": round(profit, 2),
-            "profit_margin": margin
+            "revenue": round(s["revenue"], 2),
+            "expenses": round(s["expenses"], 2),
+            "profit": round(s["profit"], 2),
+            "profit_margin": round(s["margin"], 2)
         }
-        
-        return render_template("analytics.html", summary=summary_data)
-        
-    except Exception as e:
-        return f"Error loading analytics: {str(e)}"
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        return dict(summary=summary_data)
+
+    try:
+        # Re-rendered only when this user's data or language changes
+        return cached_page("analytics.html", context, current_user.id)
+    except Exception:
+        current_app.logger.exception("%s failed", request.path)
+        return "Error loading analytics.", 500
 
-@app.route("/trends-page")
+@bp.route("/db-stats")
+@login_required
+def db_stats():
+    """Exposes connection pool and ingestion queue counters for this worker."""
+    return jsonify(dict(get_pool_stats(), ingest=write_queue.stats()))
+
+@bp.route("/cache-stats")
+@login_required
+def cache_stats():
+    """Exposes response, page and series store counters for this worker."""
+    return jsonify(dict(response_cache.stats(), pages=page_cache.stats(), series=series_store.stats()))
+
+@bp.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint for this worker; only local addresses by default (METRICS_ALLOW)."""
+    if not metrics.scrape_allowed(request.remote_addr):
+        return jsonify({"error": "Not found"}), 404
+    return current_app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/trends-page")
 @login_required
 def trends_page():
     """Renders the standalone trends visualization page."""
     return render_template("trends.html")
 
-@app.route("/health-page")
+@bp.route("/health-page")
 @login_required
 def health_page():
     """Renders the server-side health score and alerts page."""
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT SUM(revenue), SUM(expenses) FROM business_data WHERE user_id = ?", (current_user.id,))
-        result = cursor.fetchone()
-        
-        rev = result[0] or 0
-        exp = result[1] or 0
-        profit = rev - exp
-        margin = (profit / rev * 100) if rev > 0 else 0
-        
-        # Calculate health and alerts using your existing utils logic
-        health_score = calculate_health_score(rev, exp, profit)
-        alerts = generate_alerts(rev, exp, profit, margin)
+    def context():
+        # Snapshot from the batch job if still current, otherwise scored live
+        _, health_score, alerts = get_user_health(current_user.id)
 
         health_data = {
             "score": health_score,
             "alerts": alerts
         }
-        
-        return render_template("health.html", health=health_data)
-        
-    except Exception as e:
-        return f"Error loading health data: {str(e)}"
-    finally:
-        if 'conn' in locals():
-            conn.close()
+        return dict(health=health_data)
 
-@app.route("/download-report")
-@login_required
-def download_report():
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer)
-
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT SUM(revenue), SUM(expenses) FROM business_data WHERE user_id = ?", (current_user.id,))
-    result = cursor.fetchone()
-    revenue = result[0] or 0
-    expenses = result[1] or 0
-    profit = revenue - expenses
+    try:
+        return cached_page("health.html", context, current_user.id)
+    except Exception:
+        current_app.logger.exception("%s failed", request.path)
+        return "Error loading health data.", 500
 
-    p.drawString(100, 750, f"Business Report for User: {current_user.id}")
-    p.drawString(100, 730, f"Revenue: {revenue}")
-    p.drawString(100, 710, f"Expenses: {expenses}")
-    p.drawString(100, 690, f"Profit: {profit}")
+@bp.route("/reports", methods=["POST"])
+@login_required
+def create_report():
+    """Queues a PDF report and returns its job id; unchanged data reuses the cached PDF."""
+    job = submit_report(current_user.id)
+    return jsonify(job), 200 if job["status"] == "done" else 202
 
-    p.save()
-    buffer.seek(0)
+@bp.route("/reports/<job_id>")
+@login_required
+def report_status(job_id):
+    """Reports a job's status and progress (0-100)."""
+    job = job_status(job_id, current_user.id)
+    if job is None:
+        return jsonify({"error": "Report not found"}), 404
+    return jsonify(job)
+
+@bp.route("/reports/<job_id>/download")
+@login_required
+def report_download(job_id):
+    job = job_status(job_id, current_user.id)
+    if job is None or job["status"] != "done":
+        return jsonify({"error": "Report not ready"}), 404
+    return send_file(os.path.abspath(report_path(current_user.id, job_id)), as_attachment=True, download_name="report.pdf")
 
-    return send_file(buffer, as_attachment=True, download_name="report.pdf")
+@bp.route("/download-report")
+@login_required
+def download_report():
+    """Sends the report if it is ready for the current data, otherwise queues it (202 + job id)."""
+    job = submit_report(current_user.id)
+    if job["status"] == "done":
+        return send_file(os.path.abspath(report_path(current_user.id, job["job_id"])), as_attachment=True, download_name="report.pdf")
+    return jsonify(dict(job, status_url=url_for("main.report_status", job_id=job["job_id"]))), 202
 
-@app.route("/demo")
+@bp.route("/demo")
 def demo_page():
     """Renders the frontend-only interactive demo."""
-    return render_template("demo.html")
+    # The sidebar shows the signed-in user's name, so the page is cached per user
+    return cached_page("demo.html", user_id=current_user.get_id())
 
-@app.route("/privacy")
+@bp.route("/privacy")
 def privacy():
     """Renders the Privacy Policy page."""
-    return render_template("privacy.html")
+    return cached_page("privacy.html")
 
-@app.route("/terms")
+@bp.route("/terms")
 def terms():
     """Renders the Terms of Service page."""
-    return render_template("terms.html")
+    return cached_page("terms.html")
 
 # YOUR NEW ALERTS ROUTE
-@app.route("/alerts-page", methods=["GET", "POST"])
+@bp.route("/alerts-page", methods=["GET", "POST"])
 @login_required
 def alerts_page():
-    """Handles the advanced risk alerts via form submission."""
+    """
+    Shows risk alerts computed from the user's stored month-over-month figures,
+    and still runs what-if simulations from the form.
+    """
     alerts = []
+    simulated = False
+
+    # Every month is evaluated against the month before it, newest first
+    monthly = monthly_risk_alerts(current_user.id)
 
     if request.method == "POST":
         current_revenue = float(request.form.get("current_revenue", 0))
@@ -389,17 +506,23 @@ def alerts_page():
             previous_expenses,
             inventory_cost
         )
+        simulated = True
+    elif monthly:
+        alerts = monthly[0]["alerts"]
 
-    return render_template("alerts.html", alerts=alerts)
+    return render_template("alerts.html", alerts=alerts, simulated=simulated, monthly=monthly)
 
 def open_browser():
     """Opens the default web browser automatically."""
+    import webbrowser
     webbrowser.open_new("http://127.0.0.1:5000")
 
 if __name__ == "__main__":
+    import threading
+
     # Start browser in a separate thread so it doesn't block the server
     if not os.environ.get("WERKZEUG_RUN_MAIN"):
         threading.Timer(1, open_browser).start()
     
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
\ No newline at end of file
+    create_app().run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Batch health scoring vs the per-user request-time path.
+
+    python -m benchmarks.bench_batch_health [users]
+
+Seeds a throwaway database with `users` tenants (default 5000), then times
+scoring everyone with one query plus NumPy (run_batch) against looping over
+users with a totals query and the scalar calculate_health_score/generate_alerts.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from utils.aggregates import get_user_overview  # noqa: E402
+from utils.batch_health import run_batch, load_aggregates, evaluate, render_alerts  # noqa: E402
+from utils.calculations import calculate_health_score, generate_alerts  # noqa: E402
+from utils.db import get_connection, init_db, insert_records  # noqa: E402
+
+
+def seed(users, months=24, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for u in range(users):
+        base = rng.uniform(500, 5000)
+        for m in range(months):
+            rows.append((f"user{u}", f"{2024 + m // 12}-{m % 12 + 1:02d}-15",
+                         base * rng.uniform(0.5, 1.5), base * rng.uniform(0.3, 1.3), base * 0.2, "Sales"))
+        if len(rows) >= 50_000:
+            insert_records(rows)
+            rows = []
+    if rows:
+        insert_records(rows)
+
+
+def per_user_loop(users):
+    conn = get_connection()
+    try:
+        for u in range(users):
+            s = get_user_overview(f"user{u}", conn)
+            calculate_health_score(s["revenue"], s["expenses"], s["profit"])
+            generate_alerts(s["revenue"], s["expenses"], s["profit"], s["margin"])
+    finally:
+        conn.close()
+
+
+def batch_evaluate():
+    """Everything run_batch does except writing the snapshots."""
+    conn = get_connection()
+    try:
+        users, cols = load_aggregates(conn)
+        result = evaluate(cols)
+        for i in range(len(users)):
+            render_alerts(i, result["flags"], result["profit"], result["expense_ratio"])
+    finally:
+        conn.close()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time batch health scoring against the per-user path.")
+    parser.add_argument("users", nargs="?", type=int, default=5000, help="tenants to seed (default 5000)")
+    users = parser.parse_args().users
+    init_db()
+    seed(users)
+    loop_ms = timed(per_user_loop, users)
+    eval_ms = timed(batch_evaluate)
+    batch_ms = timed(run_batch)
+    print(f"users: {users}")
+    print(f"per-user loop:        {loop_ms:9.1f} ms ({loop_ms / users * 1000:.1f} us/user)")
+    print(f"batch evaluate:       {eval_ms:9.1f} ms ({eval_ms / users * 1000:.1f} us/user)")
+    print(f"batch + snapshot:     {batch_ms:9.1f} ms ({batch_ms / users * 1000:.1f} us/user)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Bytes transferred for one dashboard load, with and without compression.
+
+    python -m benchmarks.bench_compression [days]
+
+Seeds a throwaway database with one user holding `days` daily records (default
+730), then requests what the dashboard page fetches (/dashboard, /summary twice,
+/trends) through the Flask test client with each Accept-Encoding, and repeats the
+load with the ETags from the first one to show the revalidation cost.
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+
+from wsgi import app  # noqa: E402
+from utils import compression  # noqa: E402
+from utils.auth import create_user  # noqa: E402
+from utils.db import insert_records  # noqa: E402
+
+# The base template's notification bell and the dashboard script each fetch /summary
+DASHBOARD_LOAD = ("/dashboard", "/summary", "/summary", "/trends")
+
+
+def seed(days, user="bench"):
+    create_user(user, "bench-password")
+    rng = random.Random(0)
+    start = date(2024, 1, 1)
+    rows = [(user, (start + timedelta(days=d)).isoformat(), rng.uniform(500, 5000),
+             rng.uniform(300, 4000), rng.uniform(0, 800), rng.choice(("Sales", "Marketing", "Rent")))
+            for d in range(days)]
+    insert_records(rows)
+    return user
+
+
+def load(client, encoding, etags=None):
+    """Returns (bytes on the wire per path, etags) for one dashboard load."""
+    sizes, seen = {}, {}
+    for path in DASHBOARD_LOAD:
+        headers = {"Accept-Encoding": encoding}
+        if etags and etags.get(path):
+            headers["If-None-Match"] = etags[path]
+        r = client.get(path, headers=headers)
+        assert r.status_code in (200, 304), (path, r.status_code)
+        sizes[path] = sizes.get(path, 0) + len(r.get_data())
+        seen[path] = r.headers.get("ETag")
+    return sizes, seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes sent for one dashboard load per encoding.")
+    parser.add_argument("days", nargs="?", type=int, default=730, help="daily records to seed (default 730)")
+    days = parser.parse_args().days
+    user = seed(days)
+    client = app.test_client()
+    client.post("/login", data={"username": user, "password": "bench-password"})
+
+    encodings = ["identity", "gzip"]
+    if compression.brotli is not None:
+        encodings.append("br")
+
+    print(f"{days} daily records, threshold {compression.COMPRESS_MIN_SIZE} bytes")
+    paths = list(dict.fromkeys(DASHBOARD_LOAD))
+    print(f"{'encoding':>10} " + " ".join(f"{p:>12}" for p in paths) + f" {'total':>10} {'revalidate':>11}")
+    baseline = None
+    for encoding in encodings:
+        sizes, etags = load(client, encoding)
+        revalidate, _ = load(client, encoding, etags)
+        total = sum(sizes.values())
+        baseline = baseline or total
+        print(f"{encoding:>10} " + " ".join(f"{sizes[p]:>12,}" for p in paths)
+              + f" {total:>10,} {sum(revalidate.values()):>11,}  ({total / baseline:.1%})")
+
+
+if __name__ == "__main__":
+    main()
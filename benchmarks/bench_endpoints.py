@@ -0,0 +1,357 @@
+"""
+Load test for the data endpoints, in-process or against a local gunicorn.
+
+    python -m benchmarks.bench_endpoints [--users 100] [--rows-per-user 365]
+        [--mode client|gunicorn|both] [--concurrency 8] [--duration 5]
+        [--workers 2] [--cache on|off] [--endpoints summary,trends,...]
+
+The database is seeded once per (users, rows-per-user) under benchmarks/data/ and
+reused, so runs on different commits measure the same data. Each endpoint is driven
+for --duration seconds by --concurrency client threads, each logged in as its own
+slice of tenants. "client" goes through Flask's test client (no network, one
+process); "gunicorn" starts `gunicorn wsgi:app` on a free port and uses HTTP.
+
+Reports requests/s, p50/p99 latency and error count per endpoint, plus peak RSS of
+the serving process(es). Results are written to benchmarks/results/ as JSON and
+compared with the newest earlier result for the same mode and data size.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+from http.cookiejar import CookieJar
+
+import numpy as np
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+ENDPOINTS = {
+    "summary": ("GET", "/summary"),
+    "trends": ("GET", "/trends"),
+    "forecast": ("GET", "/forecast"),
+    "analytics": ("GET", "/analytics"),
+    "health-page": ("GET", "/health-page"),
+    "download-report": ("GET", "/download-report"),
+    # Last, since every write invalidates the caches the reads above are using
+    "add-data": ("POST", "/add-data"),
+}
+TENANTS_PER_CLIENT = 4
+# Besides 2xx/3xx, /download-report answers 202 while the PDF renders
+OK_STATUSES = range(200, 400)
+
+
+def add_data_body(rng):
+    return {
+        "date": (date.today() - timedelta(days=rng.randrange(30))).isoformat(),
+        "revenue": round(rng.uniform(100, 5000), 2),
+        "expenses": round(rng.uniform(100, 4000), 2),
+        "inventory_cost": round(rng.uniform(0, 800), 2),
+        "category": rng.choice(("Sales", "Marketing", "Rent")),
+    }
+
+
+class TestClientSession:
+    """One logged-in tenant on the Flask test client."""
+
+    def __init__(self, app, username, password):
+        self.client = app.test_client()
+        r = self.client.post("/login", data={"username": username, "password": password})
+        if r.status_code != 302:
+            raise RuntimeError(f"login failed for {username}: {r.status_code}")
+
+    def request(self, method, path, body=None):
+        r = self.client.open(path, method=method, json=body)
+        r.get_data()
+        return r.status_code
+
+
+class HTTPSession:
+    """One logged-in tenant talking HTTP to a server, with its own cookie jar."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        form = urllib.parse.urlencode({"username": username, "password": password}).encode()
+        with self.opener.open(base_url + "/login", data=form) as r:
+            if not r.url.endswith("/dashboard"):
+                raise RuntimeError(f"login failed for {username}")
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with self.opener.open(req) as r:
+                r.read()
+                return r.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class RSSSampler:
+    """Samples the resident set size of a process and its children in the background."""
+
+    def __init__(self, pid, interval=0.05):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        total = 0
+        for p in [self.process] + self.process.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        self.peak = max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def drive(sessions_per_thread, method, path, duration, seed=0):
+    """Runs one endpoint from every thread for `duration` seconds; returns its stats."""
+    latencies = [[] for _ in sessions_per_thread]
+    errors = [0] * len(sessions_per_thread)
+    stop = time.perf_counter() + duration
+
+    def worker(i, sessions):
+        rng = random.Random(seed + i)
+        local = latencies[i]
+        n = 0
+        while time.perf_counter() < stop:
+            session = sessions[n % len(sessions)]
+            body = add_data_body(rng) if method == "POST" else None
+            start = time.perf_counter()
+            try:
+                status = session.request(method, path, body)
+            except Exception:
+                status = None
+            local.append(time.perf_counter() - start)
+            if status not in OK_STATUSES:
+                errors[i] += 1
+            n += 1
+
+    threads = [threading.Thread(target=worker, args=(i, s)) for i, s in enumerate(sessions_per_thread)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    samples = np.concatenate([np.asarray(l) for l in latencies]) * 1000
+    return {
+        "requests": int(samples.size),
+        "errors": sum(errors),
+        "throughput": round(samples.size / elapsed, 1),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2) if samples.size else None,
+        "p99_ms": round(float(np.percentile(samples, 99)), 2) if samples.size else None,
+    }
+
+
+def make_sessions(factory, tenants, concurrency):
+    """Logs each client thread in as its own slice of tenants."""
+    sessions = []
+    for i in range(concurrency):
+        mine = tenants[i::concurrency][:TENANTS_PER_CLIENT] or [tenants[i % len(tenants)]]
+        sessions.append([factory(name) for name in mine])
+    return sessions
+
+
+def run_client(args, tenants, password):
+    from wsgi import app
+
+    sessions = make_sessions(lambda name: TestClientSession(app, name, password), tenants, args.concurrency)
+    results = {}
+    with RSSSampler(os.getpid()) as rss:
+        for name in args.endpoints:
+            method, path = ENDPOINTS[name]
+            results[name] = drive(sessions, method, path, args.duration)
+            print_row(name, results[name])
+    return results, rss.peak
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_gunicorn(args, tenants, password, env):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    cmd = [sys.executable, "-m", "gunicorn", "--workers", str(args.workers), "--threads", str(args.threads),
+           "--bind", f"127.0.0.1:{port}", "--log-level", "warning", "wsgi:app"]
+    server = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        wait_until_up(base_url, server)
+        sessions = make_sessions(lambda name: HTTPSession(base_url, name, password), tenants, args.concurrency)
+        results = {}
+        with RSSSampler(server.pid) as rss:
+            for name in args.endpoints:
+                method, path = ENDPOINTS[name]
+                results[name] = drive(sessions, method, path, args.duration)
+                print_row(name, results[name])
+        return results, rss.peak
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def wait_until_up(base_url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup (is it installed?)")
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def print_row(name, r):
+    print(f"{name:>16} {r['requests']:>9} {r['errors']:>7} {r['throughput']:>10} "
+          f"{r['p50_ms'] if r['p50_ms'] is not None else '-':>9} {r['p99_ms'] if r['p99_ms'] is not None else '-':>9}")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def previous_result(result):
+    """Newest saved result with the same mode, data size and concurrency."""
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    same = ("mode", "users", "rows_per_user", "concurrency", "workers", "cache")
+    for name in sorted(os.listdir(RESULTS_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(RESULTS_DIR, name)) as f:
+            old = json.load(f)
+        if all(old["config"].get(k) == result["config"].get(k) for k in same):
+            return old
+    return None
+
+
+def compare(old, new):
+    print(f"\nvs {old['commit']} ({old['timestamp']}):")
+    for name, r in new["endpoints"].items():
+        before = old["endpoints"].get(name)
+        if not before or not before["throughput"] or before["p99_ms"] is None or r["p99_ms"] is None:
+            continue
+        print(f"{name:>16} throughput {r['throughput'] / before['throughput'] - 1:+7.1%}   "
+              f"p99 {r['p99_ms'] / before['p99_ms'] - 1:+7.1%}")
+
+
+def save(result):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = result["timestamp"].replace(":", "").replace("-", "")
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{result['config']['mode']}-{result['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data endpoints.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows-per-user", type=int, default=365)
+    parser.add_argument("--mode", choices=("client", "gunicorn", "both"), default="client")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--cache", choices=("on", "off"), default="on",
+                        help="off sizes the response and page caches to zero")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS),
+                        type=lambda s: [e for e in s.split(",") if e])
+    parser.add_argument("--db", help="database to use (default benchmarks/data/bench-<users>u-<rows>r.db)")
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    db_path = args.db or os.path.join(DATA_DIR, f"bench-{args.users}u-{args.rows_per_user}r.db")
+    env = dict(os.environ, DATABASE_PATH=db_path,
+               REPORT_CACHE_DIR=os.path.join(DATA_DIR, "report_cache"),
+               RESPONSE_CACHE_PATH=os.path.join(DATA_DIR, "cache.db"))
+    if args.cache == "off":
+        env.update(RESPONSE_CACHE_SIZE="0", PAGE_CACHE_SIZE="0")
+    if args.mode != "client" and args.workers > 1:
+        # Per-worker memory caches would serve stale data after another worker's write
+        env.setdefault("RESPONSE_CACHE_BACKEND", "sqlite")
+    os.environ.update(env)
+
+    from benchmarks.seed import PASSWORD, seed_database, tenant_name
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    seed_seconds = None
+    if not os.path.exists(db_path):
+        start = time.perf_counter()
+        seed_database(args.users, args.rows_per_user)
+        seed_seconds = round(time.perf_counter() - start, 2)
+        print(f"Seeded {args.users} tenants x {args.rows_per_user} rows in {seed_seconds}s -> {db_path}")
+    tenants = [tenant_name(i) for i in range(args.users)]
+
+    modes = ("client", "gunicorn") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        print(f"\n[{mode}] {args.concurrency} clients, {args.duration:g}s per endpoint, cache {args.cache}")
+        print(f"{'endpoint':>16} {'requests':>9} {'errors':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        if mode == "client":
+            results, peak = run_client(args, tenants, PASSWORD)
+        else:
+            results, peak = run_gunicorn(args, tenants, PASSWORD, env)
+        print(f"peak RSS: {peak / 2 ** 20:.1f} MB")
+
+        result = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "config": {"mode": mode, "users": args.users, "rows_per_user": args.rows_per_user,
+                       "concurrency": args.concurrency, "duration": args.duration,
+                       "workers": args.workers if mode == "gunicorn" else 1, "cache": args.cache},
+            "seed_seconds": seed_seconds,
+            "peak_rss_mb": round(peak / 2 ** 20, 1),
+            "endpoints": results,
+        }
+        old = previous_result(result)
+        print(f"saved {os.path.relpath(save(result), ROOT)}")
+        if old:
+            compare(old, result)
+
+
+if __name__ == "__main__":
+    main()
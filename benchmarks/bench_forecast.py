@@ -0,0 +1,53 @@
+"""
+Per-request cost of the forecasting models on 10k-1M row histories.
+
+    python -m benchmarks.bench_forecast
+
+For each size it times: resampling raw daily rows into a monthly series
+(the cost when starting from raw rows) and each model on the resulting
+monthly series (the per-request cost when serving from the monthly rollup).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.forecasting import MODELS, predict, resample_monthly
+
+SIZES = (10_000, 100_000, 1_000_000)
+REPEAT = 20
+
+
+def synthetic_history(rows, seed=0):
+    """`rows` entries spread over ~10 years with trend, seasonality and noise."""
+    rng = np.random.default_rng(seed)
+    days = np.sort(rng.integers(0, 3650, rows))
+    dates = np.datetime64("2016-01-01") + days.astype("timedelta64[D]")
+    season = 1 + 0.3 * np.sin(2 * np.pi * days / 365.25)
+    revenue = (100 + days * 0.05) * season + rng.normal(0, 10, rows)
+    return dates, revenue
+
+
+def best_of(fn, repeat=REPEAT):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    argparse.ArgumentParser(description="Per-request cost of the forecasting models.").parse_args()
+    print(f"{'rows':>10} {'step':>10} {'ms':>10}")
+    for rows in SIZES:
+        dates, revenue = synthetic_history(rows)
+        print(f"{rows:>10} {'resample':>10} {best_of(lambda: resample_monthly(dates, revenue)):>10.3f}")
+        first, series = resample_monthly(dates, revenue)
+        for model in MODELS:
+            ms = best_of(lambda: predict(series, first, model, horizon=12))
+            print(f"{rows:>10} {model:>10} {ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+/add-data insert throughput: direct commits vs the group-commit writer.
+
+    python -m benchmarks.bench_ingest [seconds_per_run]
+
+Concurrent client threads push validated rows through WriteQueue.write(), the
+call /add-data makes, for a fixed time in each mode: direct (one transaction per
+record), queued with ack-after-commit, and queued with ack-after-enqueue. Each run
+uses a fresh database; enqueue-mode throughput counts only rows actually committed.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from utils.db import get_connection, init_db  # noqa: E402
+from utils.write_queue import IngestBusyError, WriteQueue  # noqa: E402
+
+CLIENTS = (1, 4, 16, 64)
+MODES = (("direct", "commit"), ("queued", "commit"), ("queued", "enqueue"))
+
+
+def reset():
+    conn = get_connection()
+    try:
+        for table in ("business_data", "user_totals", "user_monthly_totals", "user_category_totals"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def committed_rows():
+    conn = get_connection()
+    try:
+        return conn.execute("SELECT COUNT(*) FROM business_data").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run(mode, ack, clients, duration):
+    reset()
+    writer = WriteQueue(mode=mode, ack=ack)
+    stop = time.perf_counter() + duration
+    busy = [0]
+
+    def client(i):
+        rng = random.Random(i)
+        user = f"user{i % 50}"
+        while time.perf_counter() < stop:
+            row = (user, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                   rng.uniform(100, 5000), rng.uniform(100, 4000), rng.uniform(0, 500), "Sales")
+            try:
+                writer.write(row)
+            except IngestBusyError:
+                busy[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    return committed_rows() / elapsed, stats["avg_batch"], busy[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare direct and group-commit insert throughput.")
+    parser.add_argument("seconds_per_run", nargs="?", type=float, default=3.0, help="default 3")
+    duration = parser.parse_args().seconds_per_run
+    init_db()
+    print(f"{'mode':>16} {'clients':>8} {'rows/s':>10} {'avg batch':>10} {'busy':>6}")
+    for clients in CLIENTS:
+        for mode, ack in MODES:
+            rate, avg_batch, busy = run(mode, ack, clients, duration)
+            label = mode if mode == "direct" else f"{mode}/{ack}"
+            print(f"{label:>16} {clients:>8} {rate:>10.0f} {avg_batch:>10} {busy:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Login throughput at different scrypt work factors.
+
+    python -m benchmarks.bench_login [concurrent_clients]
+
+Each client thread verifies passwords through the bounded hashing pool, as the
+/login route does, for a fixed time per setting.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from utils import auth  # noqa: E402
+
+COSTS = (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15)
+DURATION = 3.0
+
+
+def run(n, clients):
+    stored = auth.hash_password("correct horse", n=n)
+    done = []
+    stop = time.perf_counter() + DURATION
+
+    def client():
+        count = 0
+        while time.perf_counter() < stop:
+            ok, _ = auth.run_hashing(auth.verify_password, stored, "correct horse")
+            assert ok
+            count += 1
+        done.append(count)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(done) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput at different scrypt work factors.")
+    parser.add_argument("concurrent_clients", nargs="?", type=int, default=8, help="default 8")
+    clients = parser.parse_args().concurrent_clients
+    print(f"hash workers: {auth.HASH_WORKERS}, clients: {clients}")
+    print(f"{'scrypt N':>10} {'logins/s':>10} {'ms/hash':>10}")
+    for n in COSTS:
+        rate = run(n, clients)
+        print(f"{n:>10} {rate:>10.1f} {1000 / rate * auth.HASH_WORKERS:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
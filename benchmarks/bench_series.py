@@ -0,0 +1,80 @@
+"""
+/trends and /forecast for one large tenant, from SQLite vs from the series store.
+
+    python -m benchmarks.bench_series [rows]
+
+Seeds a single tenant with one record per day for `rows` days (default 200k), then times
+each payload with the store off (SQL, a dict per row) and on (columns already
+loaded). Also reports the peak Python allocation of one call (tracemalloc) and
+how long the first, loading call takes and how much memory the columns hold.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from benchmarks.seed import seed_database  # noqa: E402
+from utils.forecasting import forecast_revenue  # noqa: E402
+from utils.series import series_store  # noqa: E402
+from utils.trends import get_trends  # noqa: E402
+
+RUNS = 5
+
+CASES = (
+    ("trends (all rows)", {}),
+    ("trends points=500", {"points": 500}),
+    ("trends bucket=week", {"bucket": "week"}),
+    ("trends limit=1000", {"limit": 1000}),
+    ("forecast seasonal", None),
+)
+
+
+def payload(user, opts):
+    if opts is None:
+        return lambda: forecast_revenue(user, "seasonal", 12)
+    full = {"start": "0000-01-01", "end": "9999-12-31", "bucket": None, "points": None, "limit": None, "cursor": None}
+    full.update(opts)
+    return lambda: get_trends(user, full)
+
+
+def measure(fn):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time /trends and /forecast from SQLite and from the series store.")
+    parser.add_argument("rows", nargs="?", type=int, default=200_000, help="daily records to seed (default 200000)")
+    rows = parser.parse_args().rows
+    user = seed_database(1, rows)[0]
+    budget = series_store.budget
+
+    start = time.perf_counter()
+    series_store.get(user)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"{rows} rows: first load {load_ms:.0f} ms, columns hold {series_store.stats()['bytes'] / 1e6:.1f} MB")
+
+    print(f"{'payload':>20} {'sql ms':>9} {'store ms':>9} {'sql MB':>8} {'store MB':>9}")
+    for label, opts in CASES:
+        fn = payload(user, opts)
+        series_store.budget = 0
+        sql_ms, sql_mb = measure(fn)
+        series_store.budget = budget
+        store_ms, store_mb = measure(fn)
+        print(f"{label:>20} {sql_ms:>9.1f} {store_ms:>9.1f} {sql_mb:>8.1f} {store_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Mixed read/write throughput with the tenant data on 1, 4 and 16 SQLite shards.
+
+    python -m benchmarks.bench_shards [seconds_per_run] [threads] [write_percent]
+
+Each shard count runs in a fresh interpreter (SHARD_COUNT is read at import)
+against a fresh set of files seeded with the same tenants. Client threads pick a
+random tenant and either append one record through insert_records(), as
+/add-data does, or read its summary and a page of /trends rows. Reads never
+wait on SQLite's single writer in WAL mode; writes to different shards do not
+wait on each other, which is what the extra files buy.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SHARD_COUNTS = (1, 4, 16)
+USERS = 400
+ROWS_PER_USER = 90
+
+
+def worker(duration, threads, write_percent):
+    """Runs in the child: seeds, then drives the mixed load and prints a JSON result."""
+    from benchmarks.seed import seed_database
+    from utils.aggregates import get_user_summary
+    from utils.db import insert_records
+    from utils.trends import fetch_rows
+
+    names = seed_database(USERS, ROWS_PER_USER)
+    stop = time.perf_counter() + duration
+    counts = [[0, 0] for _ in range(threads)]
+
+    def client(i):
+        rng = random.Random(i)
+        while time.perf_counter() < stop:
+            user = rng.choice(names)
+            if rng.randrange(100) < write_percent:
+                insert_records([(user, f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                                 rng.uniform(100, 5000), rng.uniform(100, 4000), rng.uniform(0, 500), "Sales")])
+                counts[i][1] += 1
+            else:
+                get_user_summary(user)
+                fetch_rows(user, "0000-01-01", "9999-12-31", limit=50)
+                counts[i][0] += 1
+
+    pool = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    reads = sum(c[0] for c in counts)
+    writes = sum(c[1] for c in counts)
+    print(json.dumps({"reads_per_s": reads / elapsed, "writes_per_s": writes / elapsed}))
+
+
+def run(shards, duration, threads, write_percent):
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, "directory.db"),
+               SHARD_DIR=os.path.join(workdir, "shards"), SHARD_COUNT=str(shards))
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_shards", "--worker", str(duration), str(threads), str(write_percent)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write throughput on 1, 4 and 16 shards.")
+    parser.add_argument("seconds_per_run", nargs="?", type=float, default=5.0, help="default 5")
+    parser.add_argument("threads", nargs="?", type=int, default=16, help="client threads (default 16)")
+    parser.add_argument("write_percent", nargs="?", type=int, default=20, help="default 20")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)  # set for the child run
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.seconds_per_run, args.threads, args.write_percent)
+        return
+    duration, threads, write_percent = args.seconds_per_run, args.threads, args.write_percent
+    print(f"{USERS} tenants x {ROWS_PER_USER} rows, {threads} threads, {write_percent}% writes, {duration:g} s per run")
+    print(f"{'shards':>7} {'reads/s':>10} {'writes/s':>10} {'ops/s':>10}")
+    for shards in SHARD_COUNTS:
+        result = run(shards, duration, threads, write_percent)
+        total = result["reads_per_s"] + result["writes_per_s"]
+        print(f"{shards:>7} {result['reads_per_s']:>10.0f} {result['writes_per_s']:>10.0f} {total:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
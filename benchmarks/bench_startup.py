@@ -0,0 +1,59 @@
+"""
+Worker cold start: import time and first-request latency.
+
+    python -m benchmarks.bench_startup [runs]
+
+Each run is a fresh interpreter, as a newly forked or recycled gunicorn worker
+would be, importing wsgi (which builds the app) and serving one request through the test client. The
+first run uses a new database (so the schema is created and migrated); the rest
+reuse it, which is the common case of a worker booting against an existing file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from wsgi import app
+imported = time.perf_counter()
+client = app.test_client()
+status = client.get("/").status_code
+served = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_request_ms": (served - imported) * 1000,
+                  "status": status, "reportlab_loaded": "reportlab" in sys.modules}))
+"""
+
+
+def boot(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker cold start: import time and first-request latency.")
+    parser.add_argument("runs", nargs="?", type=int, default=10, help="fresh interpreters to time (default 10)")
+    runs = parser.parse_args().runs
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, "startup.db"),
+               REPORT_CACHE_DIR=os.path.join(workdir, "reports"))
+
+    first = boot(env)
+    print(f"new database:      import {first['import_ms']:7.1f} ms   first request {first['first_request_ms']:6.1f} ms")
+    samples = [boot(env) for _ in range(runs)]
+    imports = [s["import_ms"] for s in samples]
+    requests = [s["first_request_ms"] for s in samples]
+    print(f"existing database: import {statistics.median(imports):7.1f} ms   first request "
+          f"{statistics.median(requests):6.1f} ms   (median of {runs})")
+    print(f"reportlab imported at startup: {samples[-1]['reportlab_loaded']}")
+
+
+if __name__ == "__main__":
+    main()
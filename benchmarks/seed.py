@@ -0,0 +1,75 @@
+"""
+Synthetic tenants for the benchmarks.
+
+    python -m benchmarks.seed PATH [--users N] [--rows-per-user N]
+
+Creates a SQLite database at PATH with `users` tenants named
+tenant00000, tenant00001, ... sharing the password in PASSWORD, each with
+`rows_per_user` daily business_data rows ending today. The same arguments
+always produce the same data.
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+PASSWORD = "bench-password"
+CATEGORIES = ("Sales", "Marketing", "Rent", "Salaries", "Inventory", "Utilities")
+BATCH_ROWS = 50_000
+
+
+def tenant_name(i):
+    return f"tenant{i:05d}"
+
+
+def seed_database(users, rows_per_user, seed=0):
+    """
+    Seeds the database utils.db points at (set DATABASE_PATH before importing it).
+    Returns the tenant names.
+    """
+    from utils.auth import hash_password
+    from utils.db import get_connection, init_db, insert_records
+
+    init_db()
+    names = [tenant_name(i) for i in range(users)]
+    # One hash for everyone: seeding 10k users should not run 10k key derivations
+    password_hash = hash_password(PASSWORD)
+    conn = get_connection()
+    try:
+        conn.executemany("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                         [(name, password_hash) for name in names])
+        conn.commit()
+    finally:
+        conn.close()
+
+    rng = random.Random(seed)
+    today = date.today()
+    rows = []
+    for name in names:
+        base = rng.uniform(500, 5000)
+        for d in range(rows_per_user, 0, -1):
+            day = today - timedelta(days=d - 1)
+            rows.append((name, day.isoformat(), round(base * rng.uniform(0.5, 1.5), 2),
+                         round(base * rng.uniform(0.3, 1.3), 2), round(base * rng.uniform(0, 0.4), 2),
+                         rng.choice(CATEGORIES)))
+            if len(rows) >= BATCH_ROWS:
+                insert_records(rows)
+                rows = []
+    if rows:
+        insert_records(rows)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a SQLite database with synthetic tenants.")
+    parser.add_argument("path")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--rows-per-user", type=int, default=365)
+    args = parser.parse_args()
+    os.environ["DATABASE_PATH"] = args.path
+    seed_database(args.users, args.rows_per_user)
+    print(f"Seeded {args.users} tenants x {args.rows_per_user} rows into {args.path}")
+
+
+if __name__ == "__main__":
+    main()
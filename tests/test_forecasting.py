@@ -0,0 +1,78 @@
+"""
+/forecast history: the current month is left out and months without records are gaps.
+
+    python -m pytest tests    (or python -m unittest discover tests)
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "forecast.db")
+os.environ["SHARD_COUNT"] = "0"
+
+from utils.db import init_db, insert_records  # noqa: E402
+from utils.forecasting import forecast_revenue, load_monthly_revenue, parse_forecast_args  # noqa: E402
+from utils.series import series_store  # noqa: E402
+
+MID_MONTH = datetime(2026, 10, 15)
+
+
+def add(user_id, *days_and_revenue):
+    insert_records([(user_id, day, revenue, 0.0, 0.0, "Sales") for day, revenue in days_and_revenue])
+
+
+class ForecastHistoryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        # Three complete months of 3000 and half of October so far
+        add("steady", ("2026-07-10", 3000.0), ("2026-08-10", 3000.0), ("2026-09-10", 3000.0), ("2026-10-05", 500.0))
+        # Nothing recorded in February
+        add("gappy", ("2026-01-10", 3000.0), ("2026-03-10", 3000.0), ("2026-04-02", 100.0))
+
+    def setUp(self):
+        self.budget = series_store.budget
+        series_store.budget = 0  # read the monthly rollup
+
+    def tearDown(self):
+        series_store.budget = self.budget
+
+    def test_current_month_is_not_fitted(self):
+        first, series = load_monthly_revenue("steady", today=MID_MONTH)
+        self.assertEqual(series.tolist(), [3000.0, 3000.0, 3000.0])
+        result = forecast_revenue("steady", "sma", 1, today=MID_MONTH)
+        self.assertEqual(result["forecast"], 3000.0)
+        self.assertEqual(result["history_months"], 3)
+        self.assertEqual(result["predictions"][0]["month"], "2026-10")
+
+    def test_every_model_ignores_the_partial_month(self):
+        for model in ("sma", "ses", "linear", "seasonal"):
+            self.assertAlmostEqual(forecast_revenue("steady", model, 1, today=MID_MONTH)["forecast"], 3000.0,
+                                   places=2, msg=model)
+
+    def test_missing_months_are_skipped_by_default(self):
+        today = datetime(2026, 4, 20)
+        skipped = forecast_revenue("gappy", "sma", 1, today=today)
+        self.assertEqual(skipped["forecast"], 3000.0)
+        self.assertEqual(skipped["history_months"], 2)
+        zeroed = forecast_revenue("gappy", "sma", 1, gaps="zero", today=today)
+        self.assertEqual(zeroed["forecast"], 2000.0)
+        self.assertEqual(zeroed["history_months"], 3)
+
+    def test_series_store_matches_rollup(self):
+        series_store.budget = self.budget
+        series_store.get("steady")
+        series_store.get("gappy")
+        self.assertEqual(forecast_revenue("steady", "sma", 1, today=MID_MONTH)["forecast"], 3000.0)
+        self.assertEqual(forecast_revenue("gappy", "sma", 1, today=datetime(2026, 4, 20))["forecast"], 3000.0)
+
+    def test_gaps_argument(self):
+        self.assertEqual(parse_forecast_args({}), ("sma", 1, "skip"))
+        self.assertEqual(parse_forecast_args({"gaps": "zero"})[2], "zero")
+        with self.assertRaises(ValueError):
+            parse_forecast_args({"gaps": "fill"})
+
+
+if __name__ == "__main__":
+    unittest.main()
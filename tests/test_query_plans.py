@@ -0,0 +1,46 @@
+"""
+Every route query must be served from an index: fails when one falls back to a
+full table scan of business_data or a rollup table (see utils/query_plans.py).
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "plans.db")
+os.environ["SHARD_COUNT"] = "0"
+
+from utils.db import init_db, insert_records, migrate_db  # noqa: E402
+from utils.query_plans import ROUTE_QUERIES, find_table_scans  # noqa: E402
+
+
+class QueryPlanTest(unittest.TestCase):
+    def test_no_route_query_scans_a_table(self):
+        init_db()
+        insert_records([("plans", f"2025-{m:02d}-15", 100.0, 50.0, 10.0, "Sales") for m in range(1, 13)])
+        failures = find_table_scans()
+        self.assertEqual(failures, [], "\n".join(f"{route}: {' | '.join(plan)}" for route, plan in failures))
+        self.assertTrue(ROUTE_QUERIES)
+
+
+class LegacyDateMigrationTest(unittest.TestCase):
+    def test_non_iso_dates_are_rewritten(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("""CREATE TABLE business_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, date TEXT,
+            revenue REAL, expenses REAL, inventory_cost REAL, category TEXT)""")
+        conn.executemany(
+            "INSERT INTO business_data (user_id, date, revenue, expenses, inventory_cost, category) "
+            "VALUES ('legacy', ?, 1, 1, 0, 'Sales')",
+            [("2025-03-04T10:00:00",), ("05-01-2025",), ("07/02/2025",), ("not a date",)],
+        )
+        with self.assertLogs("utils.db", "WARNING"):
+            migrate_db(conn.cursor())
+        dates = [row[0] for row in conn.execute("SELECT date FROM business_data ORDER BY id")]
+        self.assertEqual(dates, ["2025-03-04", "2025-01-05", "2025-02-07", "not a date"])
+        months = [row[0] for row in conn.execute("SELECT month FROM user_monthly_totals ORDER BY month")]
+        self.assertIn("2025-01", months)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from utils.db import get_connection
+
+# Served from the rollup tables (see utils/rollups.py): the category rows fold into
+# the overall totals and only the two months needed for growth are read.
+SUMMARY_SQL = """
+    SELECT 'category', category, revenue, expenses, inventory_cost
+    FROM user_category_totals
+    WHERE user_id = :user_id
+    UNION ALL
+    SELECT 'month', month, revenue, expenses, inventory_cost
+    FROM user_monthly_totals
+    WHERE user_id = :user_id AND month >= :previous_month
+"""
+
+TOTALS_SQL = """
+    SELECT revenue, expenses, inventory_cost
+    FROM user_totals
+    WHERE user_id = ?
+"""
+
+def month_bounds(today=None):
+    """Returns (this month, last month) as YYYY-MM strings."""
+    now = today or datetime.now()
+    first_current = now.replace(day=1)
+    last_previous = first_current - timedelta(days=1)
+    return first_current.strftime("%Y-%m"), last_previous.strftime("%Y-%m")
+
+def get_user_summary(user_id, conn=None, today=None):
+    """
+    Computes every headline metric for a user with a single rollup query:
+    totals, profit, margin, month-over-month growth and the category split.
+    """
+    current_month, previous_month = month_bounds(today)
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(user_id)
+    try:
+        rows = conn.execute(SUMMARY_SQL, {
+            "user_id": user_id,
+            "previous_month": previous_month,
+        }).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    rev = exp = inv = current_month_rev = prev_month_rev = 0
+    categories = []
+    for kind, key, row_rev, row_exp, row_inv in rows:
+        if kind == "category":
+            rev += row_rev
+            exp += row_exp
+            inv += row_inv
+            categories.append({"category": key, "revenue": row_rev, "expenses": row_exp})
+        elif key == previous_month:
+            prev_month_rev += row_rev
+        else:
+            # Matches "date >= first day of this month", so future-dated entries count too
+            current_month_rev += row_rev
+
+    return build_summary(rev, exp, inv, current_month_rev, prev_month_rev, categories)
+
+def get_user_totals(user_id, conn=None):
+    """Returns (revenue, expenses, inventory_cost) for a user from the user_totals rollup."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(user_id)
+    try:
+        row = conn.execute(TOTALS_SQL, (user_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return row if row else (0, 0, 0)
+
+def build_summary(rev, exp, inv, current_month_rev, prev_month_rev, categories):
+    """Derives profit, margin and growth from raw totals."""
+    profit = rev - exp
+    margin = (profit / rev * 100) if rev > 0 else 0
+    growth = ((current_month_rev - prev_month_rev) / prev_month_rev * 100) if prev_month_rev > 0 else 0
+    return {
+        "revenue": rev,
+        "expenses": exp,
+        "inventory": inv,
+        "profit": profit,
+        "margin": margin,
+        "growth": growth,
+        "current_month_revenue": current_month_rev,
+        "previous_month_revenue": prev_month_rev,
+        "categories": categories,
+    }
+
+def get_user_overview(user_id, conn=None):
+    """Totals-only metrics (no category split or growth) for pages that just need the headline numbers."""
+    rev, exp, inv = get_user_totals(user_id, conn)
+    return build_summary(rev, exp, inv, 0, 0, [])
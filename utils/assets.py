@@ -0,0 +1,52 @@
+"""
+Content-hashed static asset URLs.
+
+At startup every file under the static folder is hashed. Templates call
+asset_url("css/style.css"), which yields /static/css/style.css?v=<hash>; a request
+carrying the current hash is served as immutable for a year, since any change to
+the file produces a new URL.
+"""
+import hashlib
+import os
+
+from flask import request, url_for
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def build_manifest(static_folder):
+    """Maps each static file's relative path (with forward slashes) to a short content hash."""
+    manifest = {}
+    if not static_folder or not os.path.isdir(static_folder):
+        return manifest
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            manifest[os.path.relpath(path, static_folder).replace(os.sep, "/")] = digest
+    return manifest
+
+def init_app(app):
+    """Builds the manifest and registers asset_url plus the immutable caching hook."""
+    manifest = build_manifest(app.static_folder)
+    app.extensions["asset_manifest"] = manifest
+
+    def asset_url(filename):
+        version = manifest.get(filename)
+        if version is None:
+            return url_for("static", filename=filename)
+        return url_for("static", filename=filename, v=version)
+
+    def cache_static(response):
+        if request.endpoint != "static" or response.status_code != 200:
+            return response
+        filename = (request.view_args or {}).get("filename")
+        if filename and request.args.get("v") == manifest.get(filename):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+    app.add_template_global(asset_url)
+    app.after_request(cache_static)
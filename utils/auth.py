@@ -1,10 +1,110 @@
-from flask_login import UserMixin
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from utils.cache import MemoryBackend
 from utils.db import get_connection
 
-class User(UserMixin):
+# scrypt work factor: memory/CPU cost N (power of two), block size r, parallelism p
+SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N", 2 ** 14))
+SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", 1))
+
+# Request threads per gunicorn worker, as passed to --threads in the Procfile
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 32))
+# Hashing runs on a small dedicated pool so login bursts cannot take every request thread
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+# Hash jobs allowed to wait for the pool before new logins are turned away. Every running
+# or queued job holds a request thread, so together they stay at half the threads at most
+HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", max(0, WEB_THREADS // 2 - HASH_WORKERS)))
+HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))
+
+# Users resolved by the Flask-Login user_loader, so authenticated requests skip the users table
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 4096))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 300))
+
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="kdf")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE)
+
+
+class AuthBusyError(Exception):
+    """Raised when too many password checks are already queued."""
+
+
+class User:
+    """Logged-in user as Flask-Login sees it; slotted so cached instances stay small."""
+    __slots__ = ("id",)
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
     def __init__(self, id):
         self.id = id
 
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, User) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+_user_cache = MemoryBackend(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def _b64(raw):
+    return base64.b64encode(raw).decode()
+
+def _scrypt(password, salt, n, r, p):
+    # maxmem must cover 128 * n * r bytes plus overhead
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p + 1024 * 1024, dklen=32)
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Returns 'scrypt$n$r$p$salt$hash' for storing in users.password."""
+    salt = os.urandom(16)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+def verify_password(stored, password):
+    """
+    Checks a password against a stored value. Returns (ok, needs_rehash); needs_rehash
+    is True for legacy plaintext rows and hashes made with an older work factor.
+    """
+    if not stored:
+        return False, False
+    if not stored.startswith("scrypt$"):
+        # Legacy plaintext row from before hashing was introduced
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    _, n, r, p, salt, expected = stored.split("$")
+    n, r, p = int(n), int(r), int(p)
+    actual = _b64(_scrypt(password, base64.b64decode(salt), n, r, p))
+    return hmac.compare_digest(actual, expected), (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+def run_hashing(fn, *args):
+    """
+    Runs a KDF call on the bounded hashing pool. Raises AuthBusyError if the queue
+    is full or the result takes longer than HASH_TIMEOUT.
+    """
+    # Fail fast: a request thread waiting here for a slot would be one more thread lost
+    if not _hash_slots.acquire(blocking=False):
+        raise AuthBusyError("Too many login attempts in progress. Please try again.")
+    try:
+        future = _hash_pool.submit(fn, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # The slot is held until the job leaves the pool, so it bounds the executor's queue
+    future.add_done_callback(lambda _: _hash_slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()  # frees the slot now if the job has not started yet
+        raise AuthBusyError("Too many login attempts in progress. Please try again.")
+
 def get_user(username):
     """Retrieves a user from the database."""
     conn = get_connection()
@@ -16,15 +116,76 @@ def get_user(username):
         return {"username": row[0], "password": row[1]}
     return None
 
+_dummy = []
+_dummy_lock = threading.Lock()
+
+def _dummy_hash():
+    """Stand-in stored hash for unknown usernames, made once, on the hashing pool like any other."""
+    if not _dummy:
+        with _dummy_lock:
+            if not _dummy:
+                _dummy.append(run_hashing(hash_password, _b64(os.urandom(12))))
+    return _dummy[0]
+
+def load_user_record(username):
+    """
+    Returns a User for the Flask-Login user_loader, or None if the account does not exist.
+    Existing users are cached for USER_CACHE_TTL seconds; unknown names are never cached,
+    so a newly registered account is visible to every worker immediately.
+    """
+    found, user = _user_cache.get(username)
+    if found:
+        return user
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    user = User(username)
+    _user_cache.set(username, user)
+    return user
+
+def invalidate_user(username):
+    """Drops a cached user after their account changes."""
+    _user_cache.delete(username)
+
+def authenticate(username, password):
+    """
+    Returns True if the credentials are valid. Plaintext or outdated hashes are
+    re-hashed with the current work factor on a successful login.
+    """
+    user_data = get_user(username)
+    if not user_data:
+        # Spend the same KDF time so response timing does not reveal which usernames exist
+        run_hashing(verify_password, _dummy_hash(), password)
+        return False
+    ok, needs_rehash = run_hashing(verify_password, user_data["password"], password)
+    if ok and needs_rehash:
+        new_hash = run_hashing(hash_password, password)
+        conn = get_connection()
+        try:
+            # Only replace the value we verified, in case it changed meanwhile
+            conn.execute("UPDATE users SET password = ? WHERE username = ? AND password = ?",
+                         (new_hash, username, user_data["password"]))
+            conn.commit()
+        finally:
+            conn.close()
+        invalidate_user(username)
+    return ok
+
 def create_user(username, password):
     """Creates a new user in the database."""
+    password_hash = run_hashing(hash_password, password)
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password_hash))
         conn.commit()
+        invalidate_user(username)
         return True
     except:
         return False
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,179 @@
+"""
+Batch health scoring for every tenant at once.
+
+One grouped query pulls per-user totals and this/last month revenue from the
+rollup tables, the scoring and alert rules from utils/calculations.py are
+evaluated as NumPy array operations, and the results land in health_snapshots.
+/summary and /health-page use a user's snapshot while it still matches their
+totals and fall back to scoring live otherwise. Run it nightly with:
+
+    python -m utils.batch_health
+"""
+import json
+import time
+
+import numpy as np
+
+from utils.aggregates import month_bounds, build_summary
+from utils.calculations import (
+    calculate_health_score, generate_alerts,
+    LOSS_ALERT, NO_REVENUE_ALERT, TIGHT_MARGIN_ALERT, HIGH_BURN_ALERT,
+)
+from utils.db import data_databases, get_connection
+
+BATCH_SQL = """
+    SELECT t.user_id, t.revenue, t.expenses, t.inventory_cost,
+           COALESCE(SUM(CASE WHEN m.month >= :current_month THEN m.revenue END), 0),
+           COALESCE(SUM(CASE WHEN m.month = :previous_month THEN m.revenue END), 0)
+    FROM user_totals t
+    LEFT JOIN user_monthly_totals m
+           ON m.user_id = t.user_id AND m.month >= :previous_month
+    GROUP BY t.user_id
+"""
+
+# Totals and the user's snapshot (if any) in one primary-key lookup
+HEALTH_SQL = """
+    SELECT t.revenue, t.expenses, t.inventory_cost, s.revenue, s.expenses, s.score, s.alerts
+    FROM user_totals t
+    LEFT JOIN health_snapshots s ON s.user_id = t.user_id
+    WHERE t.user_id = ?
+"""
+
+def load_aggregates(conn, today=None):
+    """Returns user ids and a dict of float arrays: revenue, expenses, inventory, current, previous."""
+    current_month, previous_month = month_bounds(today)
+    rows = conn.execute(BATCH_SQL, {"current_month": current_month, "previous_month": previous_month}).fetchall()
+    users = [r[0] for r in rows]
+    data = np.array([r[1:] for r in rows], dtype=np.float64).reshape(len(rows), 5)
+    cols = dict(zip(("revenue", "expenses", "inventory", "current", "previous"), data.T))
+    return users, cols
+
+def score_batch(revenue, expenses, profit):
+    """Vectorized calculate_health_score(); returns an int array."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(revenue > 0, profit / revenue * 100, 0)
+        expense_ratio = np.where(revenue > 0, expenses / revenue * 100, 0)
+
+    score = np.full(revenue.shape, 50, dtype=np.int64)
+    score += np.select([margin >= 25, margin >= 15, margin > 0], [30, 20, 10], 0)
+    score += np.select([expense_ratio <= 40, expense_ratio <= 70], [20, 10], 0)
+    score -= np.where(profit < 0, 40, 0)
+    score = np.clip(score, 0, 100)
+
+    # No revenue: 0 when spending, a neutral 50 for brand new accounts
+    return np.where(revenue <= 0, np.where(expenses > 0, 0, 50), score)
+
+def alert_flags(revenue, expenses, profit, margin):
+    """Vectorized conditions of generate_alerts(); returns (flags dict, expense_ratio)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expense_ratio = np.where(revenue > 0, expenses / revenue * 100, 0)
+    flags = {
+        "loss": profit < 0,
+        "no_revenue": (revenue == 0) & (expenses > 0),
+        "tight_margin": (margin >= 0) & (margin < 15) & (revenue > 0),
+        "high_burn": expense_ratio > 75,
+    }
+    return flags, expense_ratio
+
+def render_alerts(i, flags, profit, expense_ratio):
+    """Alert texts for row i, in generate_alerts() order."""
+    alerts = []
+    if flags["loss"][i]:
+        alerts.append(LOSS_ALERT.format(loss=abs(profit[i])))
+    if flags["no_revenue"][i]:
+        alerts.append(NO_REVENUE_ALERT)
+    if flags["tight_margin"][i]:
+        alerts.append(TIGHT_MARGIN_ALERT)
+    if flags["high_burn"][i]:
+        alerts.append(HIGH_BURN_ALERT.format(ratio=expense_ratio[i]))
+    return alerts
+
+def evaluate(cols):
+    """Scores and alert flags for a whole batch; returns a dict of arrays."""
+    revenue, expenses = cols["revenue"], cols["expenses"]
+    profit = revenue - expenses
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margin = np.where(revenue > 0, profit / revenue * 100, 0)
+        growth = np.where(cols["previous"] > 0, (cols["current"] - cols["previous"]) / cols["previous"] * 100, 0)
+    flags, expense_ratio = alert_flags(revenue, expenses, profit, margin)
+    return {
+        "profit": profit,
+        "margin": margin,
+        "growth": growth,
+        "score": score_batch(revenue, expenses, profit),
+        "flags": flags,
+        "expense_ratio": expense_ratio,
+    }
+
+def run_batch(conn=None, today=None):
+    """
+    Scores every user and upserts health_snapshots, shard by shard unless a
+    connection is given. Returns the number of users scored.
+    """
+    if conn is not None:
+        return _score_database(conn, today)
+    scored = 0
+    for database in data_databases():
+        conn = get_connection(database=database)
+        try:
+            scored += _score_database(conn, today)
+        finally:
+            conn.close()
+    return scored
+
+def _score_database(conn, today):
+    users, cols = load_aggregates(conn, today)
+    if not users:
+        return 0
+    result = evaluate(cols)
+    now = time.time()
+    rows = [
+        (
+            user_id,
+            float(cols["revenue"][i]),
+            float(cols["expenses"][i]),
+            int(result["score"][i]),
+            json.dumps(render_alerts(i, result["flags"], result["profit"], result["expense_ratio"]), ensure_ascii=False),
+            float(result["growth"][i]),
+            now,
+        )
+        for i, user_id in enumerate(users)
+    ]
+    conn.executemany("""
+        INSERT OR REPLACE INTO health_snapshots
+        (user_id, revenue, expenses, score, alerts, growth, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    return len(rows)
+
+def get_user_health(user_id, conn=None):
+    """
+    Returns (overview, score, alerts) for a user. The snapshot is used only while its
+    totals still match the user's rollup; after new data the score is computed live.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(user_id)
+    try:
+        row = conn.execute(HEALTH_SQL, (user_id,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+
+    rev, exp, inv, snap_rev, snap_exp, score, alerts = row if row else (0, 0, 0, None, None, None, None)
+    overview = build_summary(rev, exp, inv, 0, 0, [])
+    if score is not None and snap_rev == rev and snap_exp == exp:
+        return overview, score, json.loads(alerts)
+    score = calculate_health_score(rev, exp, overview["profit"])
+    alerts = generate_alerts(rev, exp, overview["profit"], overview["margin"])
+    return overview, score, alerts
+
+
+if __name__ == "__main__":
+    from utils.db import init_db
+
+    init_db()
+    start = time.perf_counter()
+    count = run_batch()
+    print(f"Scored {count} users in {(time.perf_counter() - start) * 1000:.1f} ms.")
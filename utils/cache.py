@@ -0,0 +1,342 @@
+"""
+Per-user response cache for the JSON data endpoints.
+
+Entries are keyed by (endpoint, user, data version, arguments). add_data() bumps
+the user's data version, so a write makes every older entry unreachable at once;
+the LRU/TTL bound then evicts them. The default backend lives in process memory,
+which is exact for a single worker. Set RESPONSE_CACHE_BACKEND=sqlite to share
+entries and versions between gunicorn workers through a local SQLite file.
+Writers outside the web workers (the import CLI) call invalidate_external(),
+which memory-backend workers also see through SharedVersions.
+The same versions back the ETags on those endpoints, and the page cache for
+server-rendered HTML.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from utils.db import ConnectionPool
+
+CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 1024))
+CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH", "cache.db")
+PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", 512))
+# Seconds a memory-backend worker may go without checking for external invalidations
+CACHE_SYNC_INTERVAL = float(os.environ.get("RESPONSE_CACHE_SYNC_INTERVAL", 1))
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DDL = """CREATE TABLE IF NOT EXISTS cache_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+)"""
+
+META_DDL = """CREATE TABLE IF NOT EXISTS cache_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+)"""
+
+
+class SharedVersions:
+    """
+    Per-user version counters in the RESPONSE_CACHE_PATH file, bumped by writers
+    outside the web workers. Readers poll a single generation row at most once per
+    CACHE_SYNC_INTERVAL and reload the counters only when it has moved.
+    """
+
+    def __init__(self, path=CACHE_PATH, interval=CACHE_SYNC_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._pool = None
+        self._versions = {}
+        self._generation = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        if self._pool is None:
+            self._pool = ConnectionPool(self.path)
+            conn = self._pool.acquire()
+            conn.execute(VERSIONS_DDL)
+            conn.execute(META_DDL)
+            conn.commit()
+            conn.close()
+        return self._pool.acquire()
+
+    def bump(self, user_id):
+        conn = self._acquire()
+        try:
+            conn.execute("""
+                INSERT INTO cache_versions (user_id, version) VALUES (?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+            """, (user_id,))
+            conn.execute("""
+                INSERT INTO cache_meta (key, value) VALUES ('generation', '1')
+                ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, user_id):
+        if time.monotonic() - self._checked >= self.interval:
+            self._refresh()
+        return self._versions.get(user_id, 0)
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked < self.interval:
+                return  # another thread just did
+            self._checked = now
+            if not os.path.exists(self.path):
+                return  # nothing has been invalidated from outside yet
+            try:
+                conn = self._acquire()
+                try:
+                    row = conn.execute("SELECT value FROM cache_meta WHERE key = 'generation'").fetchone()
+                    if row is not None and row[0] != self._generation:
+                        self._versions = dict(conn.execute("SELECT user_id, version FROM cache_versions"))
+                        self._generation = row[0]
+                finally:
+                    conn.close()
+            except sqlite3.Error:
+                # Serving slightly stale entries beats failing the request; retried next interval
+                logger.exception("reading shared cache versions from %s failed", self.path)
+
+
+class MemoryBackend:
+    """Bounded LRU with per-entry TTL, local to this process."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, shared=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # SharedVersions added to the local ones, so bumps from other processes count too
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        # Versions restart at 0 with the process, so ETags also carry a per-boot epoch
+        self.epoch = uuid.uuid4().hex
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_version(self, user_id):
+        version = self._versions.get(user_id, 0)
+        if self.shared is not None:
+            version += self.shared.get(user_id)
+        return version
+
+    def bump_version(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        return self.get_version(user_id)
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self._entries), "maxsize": self.maxsize,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+
+class SQLiteBackend:
+    """
+    Cache entries and data versions in a SQLite file shared by every worker on the host.
+    Reads never write, so eviction is oldest-stored first rather than strict LRU.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS cache_entries (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires REAL NOT NULL,
+            stored REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_cache_entries_stored ON cache_entries (stored)",
+        VERSIONS_DDL,
+        META_DDL,
+    )
+
+    # Trim to maxsize every N writes rather than on every write
+    TRIM_EVERY = 64
+
+    def __init__(self, path=CACHE_PATH, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._pool = ConnectionPool(path)
+        self._writes = 0
+        self.evictions = 0
+        self.expirations = 0
+        conn = self._pool.acquire()
+        for ddl in self.SCHEMA:
+            conn.execute(ddl)
+        # First worker to start picks the epoch; the rest share it
+        conn.execute("INSERT OR IGNORE INTO cache_meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+        self.epoch = conn.execute("SELECT value FROM cache_meta WHERE key = 'epoch'").fetchone()[0]
+        conn.commit()
+        conn.close()
+
+    def get(self, key):
+        conn = self._pool.acquire()
+        try:
+            row = conn.execute("SELECT value, expires FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return False, None
+        if row[1] < time.time():
+            # Left for the next trim so reads never take the write lock
+            self.expirations += 1
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._pool.acquire()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self.evictions += conn.execute("""
+                    DELETE FROM cache_entries WHERE key IN (
+                        SELECT key FROM cache_entries ORDER BY stored DESC LIMIT -1 OFFSET ?
+                    ) OR expires < ?
+                """, (self.maxsize, now)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_version(self, user_id):
+        conn = self._pool.acquire()
+        try:
+            row = conn.execute("SELECT version FROM cache_versions WHERE user_id = ?", (user_id,)).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def bump_version(self, user_id):
+        conn = self._pool.acquire()
+        try:
+            version = conn.execute("""
+                INSERT INTO cache_versions (user_id, version) VALUES (?, 1)
+                ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+                RETURNING version
+            """, (user_id,)).fetchone()[0]
+            conn.commit()
+            return version
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._pool.acquire()
+        try:
+            size = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        finally:
+            conn.close()
+        return {"backend": "sqlite", "size": size, "maxsize": self.maxsize,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+
+class ResponseCache:
+    """Looks up per-user endpoint results, computing and storing them on a miss."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id):
+        """Current data version for a user; changes on every write."""
+        return self.backend.get_version(user_id)
+
+    def invalidate_user(self, user_id):
+        """Called after a user's data changes; every cached result for them becomes stale."""
+        return self.backend.bump_version(user_id)
+
+    def invalidate_external(self, user_id):
+        """
+        invalidate_user() for processes other than the web workers, such as the import
+        CLI: the bump also lands in the shared file that memory-backend workers poll.
+        """
+        if getattr(self.backend, "shared", None) is not None:
+            self.backend.shared.bump(user_id)
+        return self.backend.bump_version(user_id)
+
+    def etag(self, user_id, endpoint, version, *args):
+        """Strong validator for an endpoint's response at a given data version."""
+        raw = json.dumps([self.backend.epoch, endpoint, user_id, version, args], separators=(",", ":"))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_or_compute(self, user_id, endpoint, compute, *args, version=None):
+        """Returns the cached result for this version, computing it on a miss."""
+        if version is None:
+            version = self.version(user_id)
+        key = json.dumps([endpoint, user_id, version, args], separators=(",", ":"))
+        found, value = self.backend.get(key)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            return value
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        stats = self.backend.stats()
+        stats.update(hits=self.hits, misses=self.misses,
+                     hit_rate=round(self.hits / total, 4) if total else 0.0)
+        return stats
+
+
+def make_backend(name=CACHE_BACKEND):
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "memory":
+        return MemoryBackend(shared=SharedVersions())
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {name!r}")
+
+
+response_cache = ResponseCache(make_backend())
+
+# Rendered HTML stays in process memory whatever the backend; per-user pages are keyed
+# by response_cache versions, so a write in any worker still makes them unreachable.
+page_cache = ResponseCache(MemoryBackend(maxsize=PAGE_CACHE_SIZE))
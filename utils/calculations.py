@@ -35,6 +35,13 @@ def calculate_health_score(revenue, expenses, profit):
     return max(0, min(100, int(score)))
 
 
+# Alert texts, shared with the batch evaluator in utils/batch_health.py
+LOSS_ALERT = "🚨 CRITICAL: You are operating at a net loss of ₹{loss:,.2f}."
+NO_REVENUE_ALERT = "🚨 CRITICAL: You are burning cash with zero incoming revenue."
+TIGHT_MARGIN_ALERT = "⚠️ WARNING: Profit margins are very tight (under 15%). Consider reducing expenses."
+HIGH_BURN_ALERT = "⚠️ WARNING: High cash burn. Expenses are consuming {ratio:.1f}% of your revenue."
+
+
 def generate_alerts(revenue, expenses, profit, margin):
     """
     Feature 3: Automated Risk Assessment
@@ -44,16 +51,16 @@ def generate_alerts(revenue, expenses, profit, margin):
     
     # Critical Alerts
     if profit < 0:
-        alerts.append(f"🚨 CRITICAL: You are operating at a net loss of ₹{abs(profit):,.2f}.")
+        alerts.append(LOSS_ALERT.format(loss=abs(profit)))
     if revenue == 0 and expenses > 0:
-        alerts.append("🚨 CRITICAL: You are burning cash with zero incoming revenue.")
+        alerts.append(NO_REVENUE_ALERT)
         
     # Warnings
     if 0 <= margin < 15 and revenue > 0:
-        alerts.append("⚠️ WARNING: Profit margins are very tight (under 15%). Consider reducing expenses.")
+        alerts.append(TIGHT_MARGIN_ALERT)
     
     expense_ratio = (expenses / revenue) * 100 if revenue > 0 else 0
     if expense_ratio > 75:
-        alerts.append(f"⚠️ WARNING: High cash burn. Expenses are consuming {expense_ratio:.1f}% of your revenue.")
+        alerts.append(HIGH_BURN_ALERT.format(ratio=expense_ratio))
         
     return alerts
\ No newline at end of file
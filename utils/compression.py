@@ -0,0 +1,71 @@
+"""
+Response compression for JSON and HTML.
+
+Bodies above COMPRESS_MIN_SIZE are encoded with Brotli when the client accepts it
+and the optional brotli package is installed, otherwise with gzip. Streamed and
+file responses (/export, PDF downloads, static files) are left alone.
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+from flask import request
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "application/javascript",
+    "text/javascript",
+})
+
+def choose_encoding(accept_encodings):
+    """Picks "br" or "gzip" from the request's Accept-Encoding, or None."""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+def encode(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+def compress_response(response):
+    """after_request hook that compresses eligible responses in place."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(encode(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    # The encoded bytes differ from the identity body, so the validator becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_app(app):
+    """Compresses responses for the Flask app."""
+    app.after_request(compress_response)
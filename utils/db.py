@@ -1,65 +1,505 @@
+import logging
 import sqlite3
 import os
+import threading
+import time
+from datetime import datetime
 
-DB_NAME = "database.db"
+from utils import sharding
+from utils.rollups import create_rollup_tables, apply_rollups, rebuild_rollups
 
-def get_connection():
-    """Returns a connection to the SQLite database."""
-    return sqlite3.connect(DB_NAME)
+logger = logging.getLogger(__name__)
+
+DB_NAME = os.environ.get("DATABASE_PATH", "database.db")
+
+# Milliseconds a connection waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+# Idle connections kept per thread; extra connections are closed on release
+MAX_IDLE_PER_THREAD = int(os.environ.get("SQLITE_POOL_SIZE", 2))
+
+# Applied once when a pooled connection is opened
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",        # readers never block the single writer
+    "PRAGMA synchronous=NORMAL",      # safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size=-16000",       # ~16 MB page cache per connection
+    "PRAGMA mmap_size=134217728",     # 128 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# Called as observer(sql, seconds) after each statement and as observer(None, seconds)
+# after each fetch; utils.metrics installs one to count and time queries per request
+_query_observer = None
+
+
+def set_query_observer(observer):
+    """Installs (or with None, removes) the hook that receives SQL timings."""
+    global _query_observer
+    _query_observer = observer
+
+
+# Called as observer(rows, first_id) after each committed insert_records batch; the
+# batch got ids first_id, first_id + 1, ... in order. utils.series keeps loaded series current
+_insert_observer = None
+
+
+def set_insert_observer(observer):
+    """Installs (or with None, removes) the hook told about committed business_data rows."""
+    global _insert_observer
+    _insert_observer = observer
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Reports execute and fetch* time to the query observer. Rows read by iterating
+    the cursor directly are not timed, only those read through fetchone/many/all.
+    """
+
+    def execute(self, sql, parameters=()):
+        if _query_observer is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _query_observer(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _query_observer is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _query_observer(sql, time.perf_counter() - start)
+
+    def _timed_fetch(self, fetch, *args):
+        if _query_observer is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            _query_observer(None, time.perf_counter() - start)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+
+class PooledConnection(sqlite3.Connection):
+    """A sqlite3 connection whose close() hands it back to the pool instead of closing it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    # sqlite3's own Connection.execute* bypass cursor(), so route them through it
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def really_close(self):
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Keeps a small set of open SQLite connections per thread (and per process, so
+    gunicorn workers never share a handle inherited across fork).
+    """
+
+    def __init__(self, database, max_idle=MAX_IDLE_PER_THREAD):
+        self.database = database
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._stats = {"hits": 0, "misses": 0, "released": 0, "discarded": 0, "reclaimed": 0}
+
+    def _slots(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Fresh thread, or a forked worker that inherited the parent's thread-local state
+            local.pid = os.getpid()
+            local.idle = []
+            local.busy = []
+        return local
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            factory=PooledConnection,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Returns an idle connection for this thread, opening one if none is available."""
+        local = self._slots()
+        if local.idle:
+            conn = local.idle.pop()
+            self._count("hits")
+        else:
+            conn = self._open()
+            self._count("misses")
+        conn.pool = self
+        local.busy.append(conn)
+        return conn
+
+    def release(self, conn):
+        """Rolls back any open transaction and parks the connection for reuse."""
+        local = self._slots()
+        if conn not in local.busy:
+            return  # already released, or owned by another thread/process
+        local.busy.remove(conn)
+        if conn.in_transaction:
+            conn.rollback()
+        if len(local.idle) < self.max_idle:
+            local.idle.append(conn)
+            self._count("released")
+        else:
+            conn.really_close()
+            self._count("discarded")
+
+    def release_all(self):
+        """Returns every connection this thread still holds (e.g. a route forgot to close)."""
+        local = self._slots()
+        for conn in list(local.busy):
+            self._count("reclaimed")
+            self.release(conn)
+
+    def close_idle(self):
+        """Closes this thread's idle connections."""
+        local = self._slots()
+        while local.idle:
+            local.idle.pop().really_close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+        stats["pid"] = os.getpid()
+        return stats
+
+
+_pools = {DB_NAME: ConnectionPool(DB_NAME)}
+_pools_lock = threading.Lock()
+
+
+def _pool_for(database):
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                directory = os.path.dirname(database)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                pool = _pools[database] = ConnectionPool(database)
+    return pool
+
+
+def database_for(user_id=None):
+    """File holding this user's business data; the directory database when sharding is off."""
+    if user_id is None:
+        return DB_NAME
+    return sharding.database_for(user_id) or DB_NAME
+
+
+def data_databases():
+    """Every file that holds business data: the shards, or just the main database."""
+    return sharding.shard_paths() if sharding.enabled() else [DB_NAME]
+
+
+def get_connection(user_id=None, database=None):
+    """
+    Returns a pooled connection. Call close() to give it back.
+    With a user_id it is the shard holding that user's data; without one it is
+    the directory database (users, schema version). `database` picks a file directly.
+    """
+    return _pool_for(database or database_for(user_id)).acquire()
+
+
+def get_pool_stats():
+    """Returns connection pool counters and the hit rate for this worker process, summed over databases."""
+    totals = {}
+    for pool in list(_pools.values()):
+        for key, value in pool.stats().items():
+            if key not in ("hit_rate", "pid"):
+                totals[key] = totals.get(key, 0) + value
+    total = totals["hits"] + totals["misses"]
+    totals["hit_rate"] = round(totals["hits"] / total, 4) if total else 0.0
+    totals["pid"] = os.getpid()
+    totals["databases"] = len(_pools)
+    return totals
+
+
+def close_connection(exception=None):
+    """Flask teardown hook: hands back any connection the request left open."""
+    for pool in list(_pools.values()):
+        pool.release_all()
+
+
+def init_app(app):
+    """Ties the connection pool to the Flask app context."""
+    app.teardown_appcontext(close_connection)
+
+# Bump whenever init_db/migrate_db change, so existing databases are migrated once more
+SCHEMA_VERSION = 2
+
+def schema_version(conn):
+    """Schema version recorded in the database; 0 for a new file or one that predates versioning."""
+    try:
+        row = conn.execute("SELECT version FROM schema_version").fetchone()
+    except sqlite3.OperationalError:  # no schema_version table yet
+        return 0
+    return row[0] if row else 0
 
 def init_db():
-    """Initializes the database and creating fresh tables if they don't exist."""
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    # Create the business_data table if it doesn't exist
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS business_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id TEXT,
-        date TEXT,
-        revenue REAL,
-        expenses REAL,
-        inventory_cost REAL,
-        category TEXT
-    )
-    """)
-
-    # Create the users table if it doesn't exist
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        username TEXT PRIMARY KEY,
-        password TEXT
-    )
-    """)
+    """
+    Creates the tables and runs migrate_db, once per database (the directory
+    database and every shard): afterwards the schema_version row makes this a
+    single SELECT. Returns True if any file was migrated.
+    """
+    databases = [DB_NAME] + [db for db in data_databases() if db != DB_NAME]
+    migrated = [_init_database(db) for db in databases]
+    return any(migrated)
 
-    conn.commit()
-    conn.close()
+def _init_database(database):
+    conn = get_connection(database=database)
+    try:
+        if schema_version(conn) >= SCHEMA_VERSION:
+            return False
+
+        # Workers booting together queue on the write lock; the first one migrates
+        # and the rest find the new version when they get in
+        conn.execute("BEGIN IMMEDIATE")
+        if schema_version(conn) >= SCHEMA_VERSION:
+            conn.rollback()
+            return False
+        cursor = conn.cursor()
+
+        # Create the business_data table if it doesn't exist
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS business_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            date TEXT,
+            revenue REAL,
+            expenses REAL,
+            inventory_cost REAL,
+            category TEXT
+        )
+        """)
+
+        # Create the users table if it doesn't exist
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT
+        )
+        """)
+
+        # Latest batch health score per user (see utils/batch_health.py)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS health_snapshots (
+            user_id TEXT PRIMARY KEY,
+            revenue REAL NOT NULL,
+            expenses REAL NOT NULL,
+            score INTEGER NOT NULL,
+            alerts TEXT NOT NULL,
+            growth REAL NOT NULL,
+            computed_at REAL NOT NULL
+        )
+        """)
+
+        migrate_db(cursor)
+
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+        cursor.execute("DELETE FROM schema_version")
+        cursor.execute("INSERT INTO schema_version (version) VALUES (?)", (SCHEMA_VERSION,))
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+# Covering indexes: every per-user query can be answered from the index alone.
+# id follows date so /trends keyset pagination on (date, id) walks the index in order.
+INDEXES = (
+    "DROP INDEX IF EXISTS idx_business_data_user_date",
+    """CREATE INDEX IF NOT EXISTS idx_business_data_user_date_id
+       ON business_data (user_id, date, id, revenue, expenses, inventory_cost, category)""",
+    """CREATE INDEX IF NOT EXISTS idx_business_data_user_category
+       ON business_data (user_id, category, revenue, expenses)""",
+)
+
+def migrate_db(cursor):
+    """Brings an existing database up to the current schema (indexes, ISO dates)."""
+    # Rewrite any non-ISO dates so string order matches chronological order
+    changed = cursor.execute("""
+    UPDATE business_data SET date = date(date)
+    WHERE date(date) IS NOT NULL AND date(date) != date
+    """).rowcount
+    changed += normalize_legacy_dates(cursor)
+    for ddl in INDEXES:
+        cursor.execute(ddl)
+    had_rollups = cursor.execute(
+        "SELECT EXISTS(SELECT 1 FROM sqlite_master WHERE name = 'user_monthly_totals')").fetchone()[0]
+    create_rollup_tables(cursor)
+    if changed and had_rollups:
+        # Monthly rollups were keyed on the old date strings
+        rebuild_rollups(cursor)
+    cursor.execute("PRAGMA optimize")
+
+def normalize_legacy_dates(cursor):
+    """
+    Rewrites dates SQLite's date() cannot parse, such as dd-mm-yyyy, with
+    normalize_date. Returns how many rows changed; rows it cannot parse either
+    are left as they are and counted in a warning.
+    """
+    rows = cursor.execute(
+        "SELECT id, date FROM business_data WHERE date IS NOT NULL AND date(date) IS NULL").fetchall()
+    fixed, skipped = [], 0
+    for row_id, value in rows:
+        try:
+            fixed.append((normalize_date(value), row_id))
+        except ValueError:
+            skipped += 1
+    cursor.executemany("UPDATE business_data SET date = ? WHERE id = ?", fixed)
+    if skipped:
+        logger.warning("%d business_data rows keep dates that could not be parsed; "
+                       "they fall outside date-range queries until fixed", skipped)
+    return len(fixed)
+
+# Formats accepted from clients; everything is stored as YYYY-MM-DD
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y")
+
+def normalize_date(value):
+    """Parses a client-supplied date and returns it as a sortable ISO string (YYYY-MM-DD)."""
+    text = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value!r}")
 
 def insert_record(user_id, date, revenue, expenses, inventory_cost, category="General"):
     """Inserts a new financial record into the database."""
-    conn = get_connection()
-    cur = conn.cursor()
+    insert_records([(user_id, date, revenue, expenses, inventory_cost, category)])
 
-    cur.execute("""
-    INSERT INTO business_data (user_id, date, revenue, expenses, inventory_cost, category)
-    VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, date, revenue, expenses, inventory_cost, category))
+class PartialInsertError(Exception):
+    """
+    Raised by insert_records when some shards committed their rows and others failed.
+    `failed` lists the positions, in the rows passed in, of the rows not stored;
+    every other row is committed. The first shard error is the __cause__.
+    """
 
-    conn.commit()
-    conn.close()
+    def __init__(self, failed, cause):
+        super().__init__(f"{len(failed)} rows were not stored: {cause}")
+        self.failed = failed
 
-def get_all_records(user_id):
-    """Retrieves all records for a specific user from the database."""
-    conn = get_connection()
+def insert_records(rows, conn=None):
+    """
+    Inserts (user_id, date, revenue, expenses, inventory_cost, category) rows and
+    updates the rollup tables in the same transaction. Without `conn` the rows
+    are routed to their users' shards; a caller passing `conn` owns the routing.
+    Shards commit separately: if one fails after another committed, the rest are
+    still attempted and PartialInsertError says which rows were not stored.
+    """
+    rows = [
+        (user_id, normalize_date(date), revenue, expenses, inventory_cost, category or "General")
+        for user_id, date, revenue, expenses, inventory_cost, category in rows
+    ]
+    if conn is not None:
+        _insert(conn, rows)
+        return
+    # Each shard commits its own share; rows for one user always land together
+    by_database = {}
+    for i, row in enumerate(rows):
+        by_database.setdefault(database_for(row[0]), []).append(i)
+    failed, error = [], None
+    for database, positions in by_database.items():
+        conn = get_connection(database=database)
+        try:
+            _insert(conn, [rows[i] for i in positions])
+        except Exception as e:
+            if len(by_database) == 1:
+                raise  # nothing else was committed, so the batch failed as a whole
+            failed.extend(positions)
+            error = error or e
+        finally:
+            conn.close()
+    if failed:
+        if len(failed) == len(rows):
+            raise error
+        raise PartialInsertError(sorted(failed), error) from error
+
+def _insert(conn, rows):
+    observer = _insert_observer
     cur = conn.cursor()
+    cur.executemany("""
+    INSERT INTO business_data (user_id, date, revenue, expenses, inventory_cost, category)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    # The write lock is held for the whole statement, so AUTOINCREMENT ids are consecutive
+    last_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0] if observer and rows else None
+    apply_rollups(cur, rows)
+    conn.commit()
+    if last_id is not None:
+        try:
+            observer(rows, last_id - len(rows) + 1)
+        except Exception:
+            # The rows are committed; an observer failure must not report them as failed
+            logger.exception("insert observer failed after committing %d rows", len(rows))
 
-    cur.execute("SELECT date, revenue, expenses, inventory_cost, category FROM business_data WHERE user_id = ? ORDER BY date ASC", (user_id,))
-    rows = cur.fetchall()
+RECORD_COLUMNS = ("date", "revenue", "expenses", "inventory_cost", "category")
 
-    conn.close()
-    return rows
+def iter_records(user_id, batch_size=1000):
+    """
+    Yields a user's records in date order, fetching `batch_size` rows at a time
+    so memory stays constant however long the history is.
+    """
+    conn = get_connection(user_id)
+    try:
+        cur = conn.execute(
+            "SELECT date, revenue, expenses, inventory_cost, category FROM business_data WHERE user_id = ? ORDER BY date ASC, id ASC",
+            (user_id,),
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
 
-# Create/Initialize table automatically when the module is imported
-init_db()
\ No newline at end of file
+def get_all_records(user_id):
+    """Retrieves all records for a specific user from the database."""
+    return list(iter_records(user_id))
\ No newline at end of file
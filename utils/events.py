@@ -0,0 +1,165 @@
+"""
+Live dashboard updates over Server-Sent Events.
+
+Each open /events stream subscribes to its user's channel on an in-process broker.
+When records are committed (see utils/write_queue.py) the broker sends one "update"
+event with the new records and the user's refreshed /summary body, built once and
+shared by all of that user's tabs. Between events the stream sends a heartbeat
+comment every EVENTS_HEARTBEAT seconds.
+
+Channels are per process. A write handled by another gunicorn worker reaches this
+one as a changed data version (shared through RESPONSE_CACHE_BACKEND=sqlite), which
+the heartbeat turns into a "resync" event; a subscriber that falls too far behind
+also gets "resync" instead of the events it missed. Clients refetch on resync.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+from utils.cache import response_cache
+
+EVENTS_HEARTBEAT = float(os.environ.get("EVENTS_HEARTBEAT", 15))
+# Undelivered events kept per stream before it is told to resync
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 32))
+
+# Request threads per gunicorn worker (the Procfile passes the same WEB_THREADS to --threads)
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 32))
+# Threads kept free of streams so logins, reads and writes always get one
+EVENTS_RESERVED_THREADS = int(os.environ.get("EVENTS_RESERVED_THREADS", max(4, WEB_THREADS // 2)))
+# Each open stream holds a server thread, so they are capped per worker...
+EVENTS_MAX_SUBSCRIBERS = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", max(0, WEB_THREADS - EVENTS_RESERVED_THREADS)))
+# ...and closed after this long; EventSource reconnects on its own
+EVENTS_MAX_SECONDS = float(os.environ.get("EVENTS_MAX_SECONDS", 60))
+
+RECORD_FIELDS = ("date", "revenue", "expenses", "inventory_cost", "category")
+
+
+class EventsBusyError(Exception):
+    """Raised when this worker already serves EVENTS_MAX_SUBSCRIBERS streams."""
+
+
+class Subscription:
+    """One open event stream."""
+    __slots__ = ("user_id", "queue", "version", "lagging")
+
+    def __init__(self, user_id, version):
+        self.user_id = user_id
+        self.queue = queue.Queue(EVENTS_QUEUE_SIZE)
+        self.version = version
+        self.lagging = False
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class EventBroker:
+    """Fans events out to the subscriptions of one user."""
+
+    def __init__(self, snapshot=None, max_subscribers=EVENTS_MAX_SUBSCRIBERS):
+        # snapshot(user_id) builds the summary sent with each update
+        self.snapshot = snapshot
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "delivered": 0, "resyncs": 0}
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise EventsBusyError("Too many live connections. Falling back to polling.")
+            sub = Subscription(user_id, response_cache.version(user_id))
+            self._channels.setdefault(user_id, set()).add(sub)
+            self._count += 1
+            return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            channel = self._channels.get(sub.user_id)
+            if channel is None or sub not in channel:
+                return
+            channel.discard(sub)
+            self._count -= 1
+            if not channel:
+                del self._channels[sub.user_id]
+
+    def has_subscribers(self, user_id):
+        return user_id in self._channels
+
+    def publish(self, user_id, event, data, version=None):
+        """Queues an event for every stream of a user."""
+        with self._lock:
+            subs = list(self._channels.get(user_id, ()))
+            self._stats["published"] += 1
+        for sub in subs:
+            try:
+                sub.queue.put_nowait((event, data, version))
+            except queue.Full:
+                sub.lagging = True
+
+    def publish_records(self, user_id, rows):
+        """
+        Called after rows for a user are committed. Skipped entirely when nobody is
+        listening, so writes pay nothing for the feature unless a dashboard is open.
+        """
+        if not self.has_subscribers(user_id):
+            return
+        version = response_cache.version(user_id)
+        try:
+            data = {"records": [dict(zip(RECORD_FIELDS, row[1:])) for row in rows]}
+            if self.snapshot is not None:
+                data["summary"] = self.snapshot(user_id)
+        except Exception:
+            # A failed snapshot must not fail the write; clients refetch instead
+            self.publish(user_id, "resync", {}, version)
+            return
+        self.publish(user_id, "update", data, version)
+
+    def stream(self, sub, heartbeat=EVENTS_HEARTBEAT, max_seconds=EVENTS_MAX_SECONDS):
+        """Yields the SSE text for a subscription until max_seconds pass or the client leaves."""
+        try:
+            yield f"retry: {int(heartbeat * 1000)}\n\n"
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                try:
+                    event, data, version = sub.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Writes made by other workers only show up as a new data version
+                    current = response_cache.version(sub.user_id)
+                    if current != sub.version:
+                        sub.version = current
+                        yield self._resync()
+                    else:
+                        yield ": heartbeat\n\n"
+                    continue
+                if sub.lagging:
+                    sub.lagging = False
+                    while not sub.queue.empty():
+                        sub.queue.get_nowait()
+                    sub.version = response_cache.version(sub.user_id)
+                    yield self._resync()
+                    continue
+                if version is not None:
+                    sub.version = version
+                with self._lock:
+                    self._stats["delivered"] += 1
+                yield format_event(event, data)
+        finally:
+            self.unsubscribe(sub)
+
+    def _resync(self):
+        with self._lock:
+            self._stats["resyncs"] += 1
+        return format_event("resync", {})
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(subscribers=self._count, users=len(self._channels))
+        return stats
+
+
+broker = EventBroker()
@@ -0,0 +1,65 @@
+"""
+Streaming exports of a user's full ledger.
+
+Rows come from utils.db.iter_records() in fetchmany batches and are encoded
+chunk by chunk, so an export of any size uses a constant amount of memory.
+"""
+import csv
+import io
+import json
+import zlib
+
+from utils.db import iter_records, RECORD_COLUMNS
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+}
+
+# Rows encoded per yielded chunk
+CHUNK_ROWS = 500
+
+def _ndjson_chunks(rows):
+    buf = []
+    for row in rows:
+        buf.append(json.dumps(dict(zip(RECORD_COLUMNS, row)), ensure_ascii=False))
+        if len(buf) >= CHUNK_ROWS:
+            yield "\n".join(buf) + "\n"
+            buf = []
+    if buf:
+        yield "\n".join(buf) + "\n"
+
+def _csv_chunks(rows):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(RECORD_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % CHUNK_ROWS == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(user_id, fmt="ndjson", compress=False):
+    """
+    Returns (generator of bytes, mimetype, filename) for a user's ledger.
+    Raises ValueError for an unknown format.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {sorted(FORMATS)}")
+    mimetype, ext = FORMATS[fmt]
+    encode = _ndjson_chunks if fmt == "ndjson" else _csv_chunks
+    chunks = (chunk.encode("utf-8") for chunk in encode(iter_records(user_id)))
+    filename = f"ledger.{ext}"
+    if compress:
+        return _gzip(chunks), "application/gzip", filename + ".gz"
+    return chunks, mimetype, filename
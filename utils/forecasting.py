@@ -0,0 +1,193 @@
+"""
+Vectorized revenue forecasting on monthly series.
+
+A user's history is loaded once into NumPy arrays (from the monthly rollup, or
+resampled from raw date/value arrays) and every model works on whole arrays:
+moving average, simple exponential smoothing, linear trend and linear trend with
+month-of-year seasonality.
+
+Only complete months are fitted: the current month is still filling up, so it is
+left out and the forecast starts with it. Months with no records are gaps (NaN)
+that every model skips; gaps="zero" counts them as months with no revenue instead.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from utils.db import get_connection
+from utils.series import series_store
+
+MODELS = ("sma", "ses", "linear", "seasonal")
+DEFAULT_MODEL = "sma"
+MAX_HORIZON = 24
+
+SMA_WINDOW = 3
+SES_ALPHA = 0.5
+
+# Seasonal indices need at least two full years to mean anything
+MIN_SEASONAL_MONTHS = 24
+
+# How months without records enter the fit: left out, or counted as zero revenue
+GAPS = ("skip", "zero")
+DEFAULT_GAPS = "skip"
+
+
+def month_number(year, month):
+    """Months since year 0, so consecutive months differ by 1."""
+    return year * 12 + (month - 1)
+
+
+def month_label(number):
+    return f"{number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def resample_monthly(dates, values):
+    """
+    Sums daily values into a dense monthly series.
+    dates: array of datetime64[D] (or ISO strings); values: float array of the same length.
+    Returns (first month number, monthly totals) with months that have no dates set to NaN.
+    """
+    dates = np.asarray(dates, dtype="datetime64[M]")
+    if dates.size == 0:
+        return None, np.zeros(0)
+    months = dates.astype(np.int64)  # months since 1970-01
+    first = months.min()
+    totals = np.bincount(months - first, weights=np.asarray(values, dtype=np.float64))
+    totals[np.bincount(months - first) == 0] = np.nan
+    return int(first) + month_number(1970, 1), totals
+
+
+def load_monthly_revenue(user_id, conn=None, today=None):
+    """
+    The user's monthly revenue for complete months (before today's month) as a
+    dense array with NaN for months without records: resampled from their columns
+    if the series store already holds them, otherwise read from the rollup table.
+    """
+    now = today or datetime.now()
+    current = month_number(now.year, now.month)
+    columns = series_store.get(user_id, load=False) if conn is None else None
+    if columns is not None:
+        # Days are sorted, so the complete months are a prefix
+        end = np.searchsorted(columns.days, np.datetime64(month_label(current) + "-01"), "left")
+        return resample_monthly(columns.days[:end], np.nan_to_num(columns.revenue[:end]))
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(user_id)
+    try:
+        rows = conn.execute(
+            "SELECT month, revenue FROM user_monthly_totals WHERE user_id = ? AND month < ? ORDER BY month",
+            (user_id, month_label(current)),
+        ).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    if not rows:
+        return None, np.zeros(0)
+
+    numbers = np.fromiter((month_number(int(m[:4]), int(m[5:7])) for m, _ in rows), dtype=np.int64, count=len(rows))
+    values = np.fromiter((r for _, r in rows), dtype=np.float64, count=len(rows))
+    first = numbers[0]
+    series = np.full(numbers[-1] - first + 1, np.nan)
+    series[numbers - first] = np.nan_to_num(values)
+    return int(first), series
+
+
+def moving_average(series, window=SMA_WINDOW):
+    """Trailing moving average; entry i covers series[i - window + 1 : i + 1]."""
+    window = max(1, min(window, series.size))
+    cumsum = np.cumsum(np.insert(series, 0, 0.0))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def exponential_smoothing(series, alpha=SES_ALPHA):
+    """Final level of simple exponential smoothing, computed as one weighted dot product."""
+    n = series.size
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (n - 1)  # the first observation seeds the level
+    return float(weights @ series)
+
+
+def linear_trend(series):
+    """Least-squares (slope, intercept) over month index 0..n-1, skipping NaN months."""
+    months = np.flatnonzero(~np.isnan(series))
+    if months.size < 2:
+        return 0.0, float(series[months[0]]) if months.size else 0.0
+    slope, intercept = np.polyfit(months, series[months], 1)
+    return float(slope), float(intercept)
+
+
+def seasonal_indices(series, first_month):
+    """Mean detrended residual for each calendar month (12 values, January first)."""
+    slope, intercept = linear_trend(series)
+    months = np.flatnonzero(~np.isnan(series))
+    residuals = series[months] - (intercept + slope * months)
+    calendar = (first_month + months) % 12
+    sums = np.bincount(calendar, weights=residuals, minlength=12)
+    counts = np.bincount(calendar, minlength=12)
+    return np.divide(sums, counts, out=np.zeros(12), where=counts > 0)
+
+
+def predict(series, first_month, model=DEFAULT_MODEL, horizon=1):
+    """
+    Returns an array of `horizon` forecasts following the last month of `series`.
+    NaN months are gaps: SMA and SES run over the observed months, the trend
+    models fit them at their true positions.
+    """
+    n = series.size
+    observed = series[~np.isnan(series)]
+    if observed.size == 0:
+        return np.zeros(horizon)
+    steps = np.arange(n, n + horizon)
+
+    if model == "sma":
+        return np.full(horizon, moving_average(observed)[-1])
+    if model == "ses":
+        return np.full(horizon, exponential_smoothing(observed))
+    if model == "linear" or (model == "seasonal" and observed.size < MIN_SEASONAL_MONTHS):
+        slope, intercept = linear_trend(series)
+        return intercept + slope * steps
+    if model == "seasonal":
+        slope, intercept = linear_trend(series)
+        season = seasonal_indices(series, first_month)
+        return intercept + slope * steps + season[(first_month + steps) % 12]
+    raise ValueError(f"model must be one of {list(MODELS)}")
+
+
+def forecast_revenue(user_id, model=DEFAULT_MODEL, horizon=1, gaps=DEFAULT_GAPS, today=None):
+    """
+    Builds the /forecast payload; "forecast" is the value for the month after the
+    last complete one, which is normally the current month.
+    """
+    first, series = load_monthly_revenue(user_id, today=today)
+    if gaps == "zero":
+        series = np.nan_to_num(series)
+    predictions = np.maximum(predict(series, first or 0, model, horizon), 0)
+    last = (first + series.size - 1) if first is not None else None
+    return {
+        "forecast": round(float(predictions[0]), 2),
+        "model": model,
+        "horizon": horizon,
+        "gaps": gaps,
+        "history_months": int(np.count_nonzero(~np.isnan(series))),
+        "predictions": [
+            {"month": month_label(last + i + 1) if last is not None else None, "revenue": round(float(v), 2)}
+            for i, v in enumerate(predictions)
+        ],
+    }
+
+
+def parse_forecast_args(args):
+    """Validates ?model=, ?horizon= and ?gaps=. Raises ValueError with a user-facing message."""
+    model = args.get("model") or DEFAULT_MODEL
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {list(MODELS)}")
+    try:
+        horizon = int(args.get("horizon") or 1)
+    except ValueError:
+        raise ValueError("horizon must be an integer")
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}")
+    gaps = args.get("gaps") or DEFAULT_GAPS
+    if gaps not in GAPS:
+        raise ValueError(f"gaps must be one of {list(GAPS)}")
+    return model, horizon, gaps
@@ -0,0 +1,130 @@
+"""
+Record validation shared by /add-data and bulk imports.
+
+Bulk imports validate every row with the same rules as /add-data, insert valid
+rows with executemany in chunked transactions (rollups are updated once per
+chunk) and report errors per row. From the command line:
+
+    python -m utils.ingest records.csv --user alice
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+from utils.db import insert_records, normalize_date
+
+REQUIRED_FIELDS = ["date", "revenue", "expenses", "inventory_cost"]
+
+# Rows per transaction
+CHUNK_SIZE = 1000
+
+# Per-row errors returned to the caller; the total count is always reported
+MAX_REPORTED_ERRORS = 100
+
+def validate_record(data):
+    """
+    Applies the /add-data rules to one record.
+    Returns (date, revenue, expenses, inventory_cost, category) or raises ValueError.
+    """
+    if not data or not all(k in data for k in REQUIRED_FIELDS):
+        raise ValueError(f"Missing required fields: {REQUIRED_FIELDS}")
+
+    # Dates are stored as YYYY-MM-DD so string order is chronological order
+    date = normalize_date(data["date"])
+    try:
+        rev = float(data.get("revenue") or 0)
+        exp = float(data.get("expenses") or 0)
+        inv = float(data.get("inventory_cost") or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid numeric values provided")
+    cat = data.get("category") or "General"
+    return date, rev, exp, inv, cat
+
+def parse_records(stream, fmt):
+    """
+    Yields record dicts from a CSV (header row required) or JSON-array text stream.
+    Raises ValueError if the payload itself cannot be parsed.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "json":
+        try:
+            records = json.load(stream)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(records, list):
+            raise ValueError("JSON upload must be an array of records")
+        yield from records
+    else:
+        raise ValueError("format must be 'csv' or 'json'")
+
+def import_records(user_id, records, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Validates and inserts records for a user.
+    Returns {"inserted": int, "failed": int, "errors": [{"row": n, "error": msg}, ...]}.
+    `progress`, if given, is a dict whose "inserted" count is kept current as chunks
+    commit, so a caller still knows what was stored when parsing fails part way.
+    """
+    if progress is None:
+        progress = {}
+    progress["inserted"] = 0
+    inserted = failed = 0
+    errors = []
+    chunk = []
+    for row_number, record in enumerate(records, 1):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Record must be an object")
+            chunk.append((user_id,) + validate_record(record))
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": str(e)})
+            continue
+        if len(chunk) >= chunk_size:
+            insert_records(chunk)
+            inserted += len(chunk)
+            progress["inserted"] = inserted
+            chunk = []
+    if chunk:
+        insert_records(chunk)
+        inserted += len(chunk)
+        progress["inserted"] = inserted
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+def detect_format(filename=None, mimetype=None):
+    """Guesses 'csv' or 'json' from a filename or content type."""
+    name = (filename or "").lower()
+    kind = (mimetype or "").lower()
+    if name.endswith(".csv") or "csv" in kind:
+        return "csv"
+    if name.endswith(".json") or "json" in kind:
+        return "json"
+    return None
+
+
+if __name__ == "__main__":
+    from utils.cache import response_cache
+    from utils.db import init_db
+
+    parser = argparse.ArgumentParser(description="Bulk import business records for a user.")
+    parser.add_argument("path", help="CSV or JSON-array file")
+    parser.add_argument("--user", required=True, help="username that owns the records")
+    parser.add_argument("--format", choices=["csv", "json"], help="defaults to the file extension")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+    init_db()
+    with open(args.path, newline="", encoding="utf-8-sig") as f:
+        result = import_records(args.user, parse_records(f, fmt))
+    if result["inserted"]:
+        # Reaches the running web workers too, whichever cache backend they use
+        response_cache.invalidate_external(args.user)
+    for err in result["errors"]:
+        print(f"row {err['row']}: {err['error']}", file=sys.stderr)
+    print(f"Imported {result['inserted']} records, {result['failed']} rejected.")
+    sys.exit(1 if result["failed"] else 0)
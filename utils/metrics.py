@@ -0,0 +1,214 @@
+"""
+Request and SQL instrumentation, exposed at /metrics in Prometheus text format.
+
+init_app() times every request per route, counts and times the SQL it runs (via the
+query observer hook in utils.db), logs statements slower than SLOW_QUERY_MS and,
+when PROFILE_SLOW_MS is set, profiles slow requests (see utils.profiling). Each
+response gets a Server-Timing header with the same numbers for the browser devtools.
+Metrics are per worker process; with several gunicorn workers each one reports its own.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+
+from flask import request
+
+from utils import profiling
+from utils.cache import page_cache, response_cache
+from utils.db import get_pool_stats, set_query_observer
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 100))
+
+# Addresses allowed to scrape /metrics; "*" allows anyone
+METRICS_ALLOW = frozenset(os.environ.get("METRICS_ALLOW", "127.0.0.1,::1").split(","))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # One slot per bucket plus +Inf, then the running sum
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{braced(labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{braced(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{braced(format_labels(self.labels, label_values))} {value:g}")
+        return lines
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+def braced(labels):
+    return f"{{{labels}}}" if labels else ""
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram("bizhealth_http_request_duration_seconds",
+                            "Time spent serving requests.", ("method", "route"), LATENCY_BUCKETS)
+REQUESTS = Counter("bizhealth_http_requests_total", "Requests served.", ("method", "route", "status"))
+REQUEST_QUERIES = Histogram("bizhealth_request_sql_queries",
+                            "SQL statements executed per request.", ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Counter("bizhealth_request_sql_seconds_total",
+                              "Time spent in SQL while serving requests.", ("route",))
+QUERY_SECONDS = Histogram("bizhealth_sql_query_duration_seconds",
+                          "Execution time of individual SQL statements.", (), LATENCY_BUCKETS)
+SLOW_QUERIES = Counter("bizhealth_sql_slow_queries_total",
+                       f"SQL statements slower than SLOW_QUERY_MS ({SLOW_QUERY_MS:g} ms).", ())
+PROFILES = Counter("bizhealth_slow_request_profiles_total", "Slow request profiles written.", ("route",))
+
+METRICS = (REQUEST_SECONDS, REQUESTS, REQUEST_QUERIES, REQUEST_SQL_SECONDS,
+           QUERY_SECONDS, SLOW_QUERIES, PROFILES)
+
+_request = threading.local()
+_profiler = profiling.SamplingProfiler() if profiling.PROFILE_SLOW_MS > 0 else None
+
+
+def observe_query(sql, seconds):
+    """Query observer for utils.db: statement timings, plus fetch time when sql is None."""
+    state = getattr(_request, "state", None)
+    if state is not None:
+        state["sql_seconds"] += seconds
+    if sql is None:
+        return
+    if state is not None:
+        state["queries"] += 1
+    QUERY_SECONDS.observe(seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc()
+        logger.warning("slow query (%.1f ms): %s", seconds * 1000, " ".join(sql.split())[:300])
+
+
+def route_label():
+    """The matched URL rule, so label cardinality is bounded by the route table."""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def start_request():
+    _request.state = {"start": time.perf_counter(), "queries": 0, "sql_seconds": 0.0}
+    if _profiler is not None:
+        _profiler.start(threading.get_ident())
+
+
+def finish_request(status):
+    """Records the current request; returns (seconds, state) or None if already recorded."""
+    state = getattr(_request, "state", None)
+    if state is None:
+        return None
+    _request.state = None
+    seconds = time.perf_counter() - state["start"]
+    route = route_label()
+    REQUEST_SECONDS.observe(seconds, request.method, route)
+    REQUESTS.inc(1, request.method, route, status)
+    REQUEST_QUERIES.observe(state["queries"], route)
+    REQUEST_SQL_SECONDS.inc(state["sql_seconds"], route)
+    if _profiler is not None:
+        samples = _profiler.stop(threading.get_ident())
+        if seconds * 1000 >= profiling.PROFILE_SLOW_MS and samples:
+            path = profiling.write_profile(route, seconds, samples)
+            PROFILES.inc(1, route)
+            logger.warning("slow request %s %s (%.1f ms) profiled to %s", request.method, route, seconds * 1000, path)
+    return seconds, state
+
+
+def after_request(response):
+    finished = finish_request(response.status_code)
+    if finished is not None:
+        seconds, state = finished
+        response.headers.add(
+            "Server-Timing",
+            f'app;dur={seconds * 1000:.1f}, db;dur={state["sql_seconds"] * 1000:.1f};desc="{state["queries"]} queries"',
+        )
+    return response
+
+
+def teardown_request(exception=None):
+    # Only still pending if after_request never ran, i.e. the request raised
+    finish_request(500)
+
+
+def scrape_allowed(remote_addr):
+    return "*" in METRICS_ALLOW or remote_addr in METRICS_ALLOW
+
+
+def render():
+    """Prometheus text exposition of this worker's metrics."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    pool = get_pool_stats()
+    lines.append("# HELP bizhealth_db_pool_events_total Connection pool events in this worker.")
+    lines.append("# TYPE bizhealth_db_pool_events_total counter")
+    for event in ("hits", "misses", "released", "discarded", "reclaimed"):
+        lines.append(f'bizhealth_db_pool_events_total{{event="{event}"}} {pool[event]}')
+    for name, cache in (("response_cache", response_cache), ("page_cache", page_cache)):
+        stats = cache.stats()
+        lines.append(f"# HELP bizhealth_{name}_lookups_total Lookups in the {name.replace('_', ' ')}.")
+        lines.append(f"# TYPE bizhealth_{name}_lookups_total counter")
+        lines.append(f'bizhealth_{name}_lookups_total{{result="hit"}} {stats["hits"]}')
+        lines.append(f'bizhealth_{name}_lookups_total{{result="miss"}} {stats["misses"]}')
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Instruments every request of the Flask app."""
+    set_query_observer(observe_query)
+    app.before_request(start_request)
+    app.after_request(after_request)
+    app.teardown_request(teardown_request)
@@ -0,0 +1,75 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+While enabled, one background thread snapshots the stack of every thread that is
+serving a request every PROFILE_INTERVAL_MS. When a request finishes slower than
+PROFILE_SLOW_MS its samples are written to PROFILE_DIR in collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl and speedscope read.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))  # 0 disables profiling
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+MAX_DEPTH = 64
+
+
+def collapse(frame):
+    """Renders a frame's call stack root-first as "file:function:line;..."."""
+    parts = []
+    while frame is not None and len(parts) < MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    """Samples registered threads from a single daemon thread."""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, ident):
+        """Begins collecting samples for a thread."""
+        with self._lock:
+            self._active[ident] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, ident):
+        """Stops sampling a thread and returns its Counter of collapsed stacks."""
+        with self._lock:
+            return self._active.pop(ident, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[collapse(frame)] += 1
+
+
+def write_profile(route, seconds, samples, directory=PROFILE_DIR):
+    """Writes a request's samples to a .folded file and returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(seconds * 1000)}ms-{slug}.folded")
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
@@ -0,0 +1,82 @@
+"""
+Query plan regression checks for business_data.
+
+Run `python -m utils.query_plans` after touching a route query or the indexes in
+utils/db.py; it exits non-zero if any route query falls back to a full table scan
+of business_data or one of the rollup tables.
+"""
+import sys
+
+from utils import series
+from utils.aggregates import SUMMARY_SQL, TOTALS_SQL
+from utils.db import data_databases, get_connection, init_db
+from utils.trends import ROWS_SQL, BUCKET_SQL, BUCKETS
+
+# (route, SQL, sample parameters) for every per-user query the routes issue
+ROUTE_QUERIES = [
+    ("/summary",
+     SUMMARY_SQL,
+     {"user_id": "user", "previous_month": "2025-12"}),
+    ("/analytics, /health-page, /download-report",
+     TOTALS_SQL,
+     ("user",)),
+    ("/forecast",
+     "SELECT month, revenue FROM user_monthly_totals WHERE user_id = ? AND month < ? ORDER BY month",
+     ("user", "2026-01")),
+    ("/trends",
+     ROWS_SQL,
+     {"user_id": "user", "start": "0000-01-01", "end": "9999-12-31",
+      "after_date": "2025-06-01", "after_id": 10, "limit": 500}),
+    ("/export",
+     "SELECT date, revenue, expenses, inventory_cost, category FROM business_data WHERE user_id = ? ORDER BY date ASC, id ASC",
+     ("user",)),
+    ("series store check",
+     series.COUNT_SQL,
+     ("user",)),
+    ("series store load",
+     series.ROWS_SQL,
+     ("user", 0)),
+] + [
+    (f"/trends?bucket={bucket}",
+     BUCKET_SQL.format(key=key),
+     {"user_id": "user", "start": "2025-01-01", "end": "2025-12-31"})
+    for bucket, key in BUCKETS.items()
+]
+
+
+def explain(conn, sql, params):
+    """Returns the EXPLAIN QUERY PLAN detail lines for a query."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+# A full scan of any of these tables grows with every tenant's data
+WATCHED_TABLES = ("business_data", "user_totals", "user_monthly_totals", "user_category_totals")
+
+
+def find_table_scans(conn=None):
+    """Returns (route, plan) pairs for every route query that scans business_data or a rollup table."""
+    own_conn = conn is None
+    if own_conn:
+        # Shards share one schema, so the first one speaks for all of them
+        conn = get_connection(database=data_databases()[0])
+    try:
+        failures = []
+        for route, sql, params in ROUTE_QUERIES:
+            plan = explain(conn, sql, params)
+            if any(line.startswith(f"SCAN {table}") for line in plan for table in WATCHED_TABLES):
+                failures.append((route, plan))
+        return failures
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    init_db()
+    failures = find_table_scans()
+    for route, plan in failures:
+        print(f"FAIL {route}: {' | '.join(plan)}")
+    if not failures:
+        print(f"OK: {len(ROUTE_QUERIES)} route queries use an index")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,104 @@
+"""
+Moves each user's business data to the shard the current SHARD_COUNT routes it to.
+
+    SHARD_COUNT=4 python -m utils.rebalance --dry-run   # show what would move
+    SHARD_COUNT=4 python -m utils.rebalance             # move it
+
+Run it with the app stopped. It reads every file that can hold business data
+(the main database and any shard-*.db in SHARD_DIR, including shards a smaller
+count no longer uses) and moves the users that are not where they belong:
+splitting the original single file, growing from N to M shards (only about
+(M-N)/M of the users move) and, with SHARD_COUNT=0, merging shards back into
+DATABASE_PATH all work the same way. Rows are copied into the target with
+insert_records so its rollups stay in step, then deleted from the source
+together with the source's rollups and health snapshot. Each user is committed
+on the target before it is deleted from the source, so an interruption can
+leave the user in progress in both files but never in neither; delete that
+user's rows from the target before re-running, or they are copied twice.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from utils import sharding
+from utils.db import DB_NAME, database_for, get_connection, init_db, insert_records
+
+PER_USER_TABLES = ("business_data", "user_totals", "user_monthly_totals", "user_category_totals",
+                   "health_snapshots")
+
+
+def source_databases():
+    """The main database plus every shard file on disk."""
+    shards = sorted(glob.glob(os.path.join(sharding.SHARD_DIR, "shard-*.db")))
+    return [DB_NAME] + [path for path in shards if os.path.abspath(path) != os.path.abspath(DB_NAME)]
+
+
+def plan_moves():
+    """Returns [(user_id, source, target)] for every user stored outside its target shard."""
+    moves = []
+    for source in source_databases():
+        conn = get_connection(database=source)
+        try:
+            users = [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM business_data")]
+        finally:
+            conn.close()
+        for user_id in users:
+            target = database_for(user_id)
+            if os.path.abspath(target) != os.path.abspath(source):
+                moves.append((user_id, source, target))
+    return moves
+
+
+def move_user(user_id, source, target):
+    """Copies one user's rows to `target`, then deletes them from `source`. Returns the row count."""
+    src = get_connection(database=source)
+    try:
+        rows = src.execute(
+            "SELECT user_id, date, revenue, expenses, inventory_cost, category FROM business_data "
+            "WHERE user_id = ? ORDER BY date, id",
+            (user_id,),
+        ).fetchall()
+        dst = get_connection(database=target)
+        try:
+            insert_records(rows, conn=dst)
+        finally:
+            dst.close()
+        for table in PER_USER_TABLES:
+            src.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        src.commit()
+        return len(rows)
+    finally:
+        src.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move users' data to the shard SHARD_COUNT routes them to.")
+    parser.add_argument("--dry-run", action="store_true", help="print the moves without making them")
+    args = parser.parse_args(argv)
+
+    init_db()
+    moves = plan_moves()
+    layout = f"{sharding.SHARD_COUNT} shards in {sharding.SHARD_DIR}" if sharding.enabled() else DB_NAME
+    print(f"{len(moves)} users to move (target layout: {layout}).")
+    if args.dry_run:
+        pairs = {}
+        for _, source, target in moves:
+            pairs[(source, target)] = pairs.get((source, target), 0) + 1
+        for (source, target), count in sorted(pairs.items()):
+            print(f"  {source} -> {target}: {count} users")
+        return 0
+
+    start = time.perf_counter()
+    total = 0
+    for i, (user_id, source, target) in enumerate(moves, 1):
+        total += move_user(user_id, source, target)
+        if i % 100 == 0 or i == len(moves):
+            print(f"  {i}/{len(moves)} users, {total} rows")
+    print(f"Moved {len(moves)} users ({total} rows) in {time.perf_counter() - start:.1f} s.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Background PDF report generation.
+
+A report request is turned into a job on a small thread pool and the caller gets
+a job id straight away. The job id is derived from the user and their rollup totals,
+which every worker reads the same, so finished PDFs on disk double as a cache:
+repeat requests for unchanged data are served instantly, by any worker, and a new
+write produces a new job id. Job status is also written next to the PDF, so any
+worker can report on a job another one is running.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from utils.aggregates import get_user_summary
+from utils.batch_health import get_user_health
+from utils.db import get_connection
+
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", "report_cache")
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 2))
+
+# Finished job records kept in memory for status lookups
+JOB_TTL = 3600
+
+# A queued or running job whose status file has not changed for this long is assumed lost
+JOB_STALE = 600
+
+# Every insert changes the row count, and the sums cover rollup rebuilds
+VERSION_SQL = "SELECT row_count, revenue, expenses, inventory_cost FROM user_totals WHERE user_id = ?"
+
+# Months shown in the monthly table and chart
+REPORT_MONTHS = 12
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+_jobs = {}
+_lock = threading.Lock()
+
+
+def report_job_id(user_id):
+    """Deterministic id for the user's report at their current data, the same in every worker."""
+    conn = get_connection(user_id)
+    try:
+        row = conn.execute(VERSION_SQL, (user_id,)).fetchone()
+    finally:
+        conn.close()
+    raw = json.dumps(["report", user_id, list(row) if row else None], separators=(",", ":"))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def report_path(user_id, job_id):
+    """Cached PDF location; the user's hash in the name keeps one user from reading another's file."""
+    owner = hashlib.sha1(str(user_id).encode()).hexdigest()[:16]
+    return os.path.join(REPORT_CACHE_DIR, f"{owner}-{job_id}.pdf")
+
+
+def status_path(user_id, job_id):
+    return report_path(user_id, job_id)[:-len(".pdf")] + ".json"
+
+
+def _set(job_id, **fields):
+    with _lock:
+        job = _jobs[job_id]
+        job.update(fields, updated=time.time())
+        job = dict(job)
+    _write_status(job_id, job)
+
+
+def _write_status(job_id, job):
+    """Shares a job's progress with the other workers through a file next to the PDF."""
+    path = status_path(job["user_id"], job_id)
+    try:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({k: job[k] for k in ("status", "progress", "error", "updated")}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # status lookups in other workers fall back to the PDF itself
+
+
+def _read_status(user_id, job_id):
+    try:
+        with open(status_path(user_id, job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _prune():
+    cutoff = time.time() - JOB_TTL
+    with _lock:
+        for job_id in [j for j, job in _jobs.items() if job["status"] in ("done", "failed") and job["updated"] < cutoff]:
+            del _jobs[job_id]
+
+
+def submit_report(user_id):
+    """Queues a report for the user unless an identical one exists. Returns the job status."""
+    job_id = report_job_id(user_id)
+    _prune()
+    shared = _read_status(user_id, job_id)
+    # Queued or running in another worker, which is still updating its status file
+    elsewhere = shared is not None and shared["status"] in ("queued", "running") \
+        and shared["updated"] > time.time() - JOB_STALE
+    queued = None
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["status"] == "failed":
+            if os.path.exists(report_path(user_id, job_id)):
+                job = {"user_id": user_id, "status": "done", "progress": 100, "error": None}
+                _jobs[job_id] = dict(job, updated=time.time())
+            elif job is not None or not elsewhere:
+                queued = {"user_id": user_id, "status": "queued", "progress": 0, "error": None, "updated": time.time()}
+                _jobs[job_id] = dict(queued)
+    if queued is not None:
+        _write_status(job_id, queued)
+        _executor.submit(_run, job_id, user_id)
+    return job_status(job_id, user_id)
+
+
+def job_status(job_id, user_id):
+    """Returns {"job_id", "status", "progress", "error"} or None if the user has no such job."""
+    if not re.fullmatch(r"[0-9a-f]{40}", job_id):
+        return None
+    with _lock:
+        job = dict(_jobs.get(job_id) or {})
+    if job and job["user_id"] != user_id:
+        return None
+    if not job:
+        # Started by another worker, or before a restart; the files on disk are the source of truth
+        if os.path.exists(report_path(user_id, job_id)):
+            job = {"status": "done", "progress": 100, "error": None}
+        else:
+            job = _read_status(user_id, job_id)
+            if job is None:
+                return None
+    return {"job_id": job_id, "status": job["status"], "progress": job["progress"], "error": job["error"]}
+
+
+def _run(job_id, user_id):
+    try:
+        _set(job_id, status="running", progress=5)
+        data = _collect(user_id)
+        _set(job_id, progress=40)
+        pdf = render_report(user_id, data)
+        _set(job_id, progress=90)
+
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        path = report_path(user_id, job_id)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, path)
+        _remove_stale(path)
+        _set(job_id, status="done", progress=100)
+    except Exception as e:
+        _set(job_id, status="failed", error=str(e))
+
+
+def _remove_stale(path):
+    """Deletes the user's PDFs and status files for older data versions."""
+    owner, current = os.path.basename(path)[:-len(".pdf")].split("-", 1)
+    for name in os.listdir(REPORT_CACHE_DIR):
+        old = os.path.join(REPORT_CACHE_DIR, name)
+        stem, ext = os.path.splitext(name)
+        if stem.startswith(owner + "-") and ext in (".pdf", ".json") and stem != f"{owner}-{current}":
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _collect(user_id):
+    summary = get_user_summary(user_id)
+    _, score, alerts = get_user_health(user_id)
+    conn = get_connection(user_id)
+    try:
+        months = conn.execute(
+            "SELECT month, revenue, expenses, inventory_cost FROM user_monthly_totals "
+            "WHERE user_id = ? ORDER BY month DESC LIMIT ?",
+            (user_id, REPORT_MONTHS),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {"summary": summary, "score": score, "alerts": alerts, "months": months[::-1]}
+
+
+def _money(value):
+    return f"{value or 0:,.2f}"
+
+
+def render_report(user_id, data):
+    """Builds the PDF: headline numbers, health, monthly chart and table, category split."""
+    # reportlab takes longer to import than the rest of the app; only report jobs need it
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    s = data["summary"]
+    grid = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#eef2ff")),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#cbd5e1")),
+        ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ])
+
+    story = [
+        # Paragraph text is markup, so anything user-supplied is escaped
+        Paragraph(f"Business Report for User: {escape(str(user_id))}", styles["Title"]),
+        Paragraph(time.strftime("Generated %Y-%m-%d %H:%M"), styles["Normal"]),
+        Spacer(1, 12),
+        Table([
+            ["Metric", "Value"],
+            ["Revenue", _money(s["revenue"])],
+            ["Expenses", _money(s["expenses"])],
+            ["Profit", _money(s["profit"])],
+            ["Profit margin", f"{s['margin']:.2f}%"],
+            ["Month-over-month growth", f"{s['growth']:.2f}%"],
+            ["Health score", f"{data['score']}/100"],
+        ], colWidths=[220, 160], style=grid),
+        Spacer(1, 12),
+    ]
+    for alert in data["alerts"]:
+        # Built-in PDF fonts have no emoji glyphs
+        story.append(Paragraph(escape(alert.encode("ascii", "ignore").decode().strip()), styles["Normal"]))
+
+    if data["months"]:
+        story += [Spacer(1, 12), Paragraph("Monthly breakdown", styles["Heading2"])]
+        chart = VerticalBarChart()
+        chart.x, chart.y, chart.width, chart.height = 40, 20, 420, 160
+        chart.data = [[m[1] or 0 for m in data["months"]], [m[2] or 0 for m in data["months"]]]
+        chart.categoryAxis.categoryNames = [m[0] for m in data["months"]]
+        chart.categoryAxis.labels.fontSize = 7
+        chart.valueAxis.valueMin = 0
+        chart.bars[0].fillColor = colors.HexColor("#4f46e5")
+        chart.bars[1].fillColor = colors.HexColor("#f43f5e")
+        drawing = Drawing(480, 200)
+        drawing.add(chart)
+        story += [drawing, Table(
+            [["Month", "Revenue", "Expenses", "Inventory", "Profit"]] + [
+                [m[0], _money(m[1]), _money(m[2]), _money(m[3]), _money((m[1] or 0) - (m[2] or 0))]
+                for m in data["months"]
+            ], style=grid)]
+
+    if s["categories"]:
+        story += [Spacer(1, 12), Paragraph("By category", styles["Heading2"]), Table(
+            [["Category", "Revenue", "Expenses"]] + [
+                [c["category"], _money(c["revenue"]), _money(c["expenses"])] for c in s["categories"]
+            ], style=grid)]
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title="Business Report").build(story)
+    return buffer.getvalue()
@@ -1,37 +1,195 @@
+"""
+Month-over-month risk rules.
+
+Rules are declared in config/risk_rules.json (or the file named by RISK_RULES_PATH)
+and compiled once at import into NumPy predicate closures. Each predicate takes a
+dict of metric arrays (one entry per month) and returns a boolean array, so every
+rule is evaluated for every month of a user's history in a single pass.
+
+A rule's "when" is either a condition or {"all": [...]} / {"any": [...]} of them.
+A condition compares a metric with a constant ("value") or with another metric
+("ref", optionally scaled by "factor"):
+
+    {"metric": "inventory_cost", "op": ">", "ref": "revenue", "factor": 0.5}
+"""
+import json
+import operator
+import os
+
+import numpy as np
+
+from utils.db import get_connection
+
+RULES_PATH = os.environ.get(
+    "RISK_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "risk_rules.json"),
+)
+
+HEALTHY_MESSAGE = "✅ All metrics look healthy. No active alerts."
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+METRICS = (
+    "revenue", "expenses", "inventory_cost",
+    "previous_revenue", "previous_expenses", "previous_inventory_cost",
+    "margin", "previous_margin", "revenue_change_pct", "expense_change_pct",
+)
+
+
 def calculate_profit_margin(revenue, expenses):
     if revenue == 0:
         return 0
     return ((revenue - expenses) / revenue) * 100
 
 
+def _ratio_pct(numerator, denominator):
+    """numerator / denominator * 100, or 0 where the denominator is 0."""
+    safe = np.where(denominator == 0, 1, denominator)
+    return np.where(denominator == 0, 0.0, numerator / safe * 100)
+
+
+def build_metrics(revenue, expenses, inventory_cost, previous_revenue, previous_expenses, previous_inventory_cost):
+    """Derives every rule metric from month and previous-month arrays."""
+    arrays = [np.asarray(a, dtype=np.float64) for a in (
+        revenue, expenses, inventory_cost, previous_revenue, previous_expenses, previous_inventory_cost)]
+    rev, exp, inv, prev_rev, prev_exp, prev_inv = arrays
+    return {
+        "revenue": rev,
+        "expenses": exp,
+        "inventory_cost": inv,
+        "previous_revenue": prev_rev,
+        "previous_expenses": prev_exp,
+        "previous_inventory_cost": prev_inv,
+        "margin": _ratio_pct(rev - exp, rev),
+        "previous_margin": _ratio_pct(prev_rev - prev_exp, prev_rev),
+        "revenue_change_pct": _ratio_pct(rev - prev_rev, prev_rev),
+        "expense_change_pct": _ratio_pct(exp - prev_exp, prev_exp),
+    }
+
+
+def compile_condition(spec):
+    """Turns a rule's "when" clause into a closure over a metrics dict."""
+    if "all" in spec or "any" in spec:
+        combine = operator.and_ if "all" in spec else operator.or_
+        parts = [compile_condition(s) for s in spec["all" if "all" in spec else "any"]]
+        if not parts:
+            raise ValueError("Empty all/any clause in risk rule")
+        first, rest = parts[0], parts[1:]
+
+        def predicate(m):
+            result = first(m)
+            for part in rest:
+                result = combine(result, part(m))
+            return result
+        return predicate
+
+    metric = spec["metric"]
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r} in risk rule")
+    if spec["op"] not in OPERATORS:
+        raise ValueError(f"Unknown operator {spec['op']!r} in risk rule")
+    op = OPERATORS[spec["op"]]
+
+    if "ref" in spec:
+        ref = spec["ref"]
+        if ref not in METRICS:
+            raise ValueError(f"Unknown metric {ref!r} in risk rule")
+        factor = float(spec.get("factor", 1))
+        if factor == 1:
+            return lambda m: op(m[metric], m[ref])
+        return lambda m: op(m[metric], m[ref] * factor)
+
+    value = float(spec["value"])
+    return lambda m: op(m[metric], value)
+
+
+def compile_rules(specs):
+    """Returns a tuple of (id, message, predicate) in declaration order."""
+    return tuple((spec["id"], spec["message"], compile_condition(spec["when"])) for spec in specs)
+
+
+def load_rules(path=RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return compile_rules(json.load(f))
+
+
+RULES = load_rules()
+
+
+def evaluate_rules(metrics, rules=None):
+    """Returns a (rules x months) boolean matrix of which rules fire for which month."""
+    rules = RULES if rules is None else rules
+    fired = np.empty((len(rules), len(metrics["revenue"])), dtype=bool)
+    for i, (_, _, predicate) in enumerate(rules):
+        fired[i] = predicate(metrics)
+    return fired
+
+
+def messages_for(fired, index, rules=None):
+    """Alert texts for one month (column) of an evaluate_rules() result."""
+    rules = RULES if rules is None else rules
+    alerts = [message for (_, message, _), hit in zip(rules, fired[:, index]) if hit]
+    return alerts or [HEALTHY_MESSAGE]
+
+
 def generate_risk_alerts(current_revenue, previous_revenue,
                          current_expenses, previous_expenses,
                          inventory_cost):
+    """Evaluates the rules for a single hand-entered month (the simulation form)."""
+    metrics = build_metrics([current_revenue], [current_expenses], [inventory_cost],
+                            [previous_revenue], [previous_expenses], [0])
+    return messages_for(evaluate_rules(metrics), 0)
 
-    alerts = []
-
-    current_margin = calculate_profit_margin(current_revenue, current_expenses)
-    previous_margin = calculate_profit_margin(previous_revenue, previous_expenses)
-
-    # Expense spike
-    if previous_expenses > 0:
-        expense_increase = ((current_expenses - previous_expenses) / previous_expenses) * 100
-        if expense_increase > 20:
-            alerts.append("⚠ Expenses increased by more than 20% compared to last month.")
 
-    # Margin drop
-    if current_margin < previous_margin:
-        alerts.append("⚠ Profit margin declined compared to last month.")
+def monthly_risk_alerts(user_id, conn=None):
+    """
+    Evaluates every rule for every month the user has data, comparing each month
+    with the calendar month before it. Returns [{"month", "revenue", "expenses",
+    "inventory_cost", "alerts"}] newest first.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection(user_id)
+    try:
+        rows = conn.execute(
+            "SELECT month, revenue, expenses, inventory_cost FROM user_monthly_totals WHERE user_id = ? ORDER BY month",
+            (user_id,),
+        ).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    if not rows:
+        return []
 
-    # Low margin
-    if current_margin < 10:
-        alerts.append("⚠ Profit margin below 10%. Business may be at risk.")
+    months = [r[0] for r in rows]
+    values = np.array([r[1:] for r in rows], dtype=np.float64)
+    # Previous calendar month, or zeros when the user recorded nothing that month
+    index = {m: i for i, m in enumerate(months)}
+    prev_idx = np.array([index.get(_previous_month(m), -1) for m in months])
+    previous = np.where(prev_idx[:, None] >= 0, values[prev_idx], 0.0)
 
-    # Inventory risk
-    if inventory_cost > current_revenue * 0.5:
-        alerts.append("⚠ Inventory cost is high relative to revenue.")
+    metrics = build_metrics(values[:, 0], values[:, 1], values[:, 2],
+                            previous[:, 0], previous[:, 1], previous[:, 2])
+    fired = evaluate_rules(metrics)
+    return [
+        {
+            "month": months[i],
+            "revenue": round(float(values[i, 0]), 2),
+            "expenses": round(float(values[i, 1]), 2),
+            "inventory_cost": round(float(values[i, 2]), 2),
+            "alerts": messages_for(fired, i),
+        }
+        for i in range(len(months) - 1, -1, -1)
+    ]
 
-    if not alerts:
-        alerts.append("✅ All metrics look healthy. No active alerts.")
 
-    return alerts
\ No newline at end of file
+def _previous_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year - 1:04d}-12" if mon == 1 else f"{year:04d}-{mon - 1:02d}"
@@ -0,0 +1,169 @@
+"""
+Per-user rollup tables kept in step with business_data.
+
+Every insert into business_data goes through apply_rollups() in the same
+transaction, so the read endpoints can serve totals without touching raw rows.
+Run `python -m utils.rollups verify` to compare the rollups against the raw rows
+and `python -m utils.rollups rebuild` to recompute them from scratch.
+"""
+import sys
+
+ROLLUP_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS user_totals (
+        user_id TEXT PRIMARY KEY,
+        revenue REAL NOT NULL DEFAULT 0,
+        expenses REAL NOT NULL DEFAULT 0,
+        inventory_cost REAL NOT NULL DEFAULT 0,
+        row_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_monthly_totals (
+        user_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        revenue REAL NOT NULL DEFAULT 0,
+        expenses REAL NOT NULL DEFAULT 0,
+        inventory_cost REAL NOT NULL DEFAULT 0,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, month)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_category_totals (
+        user_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        revenue REAL NOT NULL DEFAULT 0,
+        expenses REAL NOT NULL DEFAULT 0,
+        inventory_cost REAL NOT NULL DEFAULT 0,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, category)
+    ) WITHOUT ROWID
+    """,
+)
+
+# (table, key columns, SQL expressions that derive the key from business_data)
+ROLLUPS = (
+    ("user_totals", ("user_id",), ("user_id",)),
+    ("user_monthly_totals", ("user_id", "month"), ("user_id", "substr(date, 1, 7)")),
+    ("user_category_totals", ("user_id", "category"), ("user_id", "COALESCE(category, 'General')")),
+)
+
+# Relative tolerance when comparing incrementally summed floats against a fresh SUM()
+TOLERANCE = 1e-6
+
+def create_rollup_tables(cursor):
+    """Creates the rollup tables and backfills them if business_data already has rows."""
+    for ddl in ROLLUP_SCHEMA:
+        cursor.execute(ddl)
+    has_rollups = cursor.execute("SELECT EXISTS(SELECT 1 FROM user_totals)").fetchone()[0]
+    has_rows = cursor.execute("SELECT EXISTS(SELECT 1 FROM business_data)").fetchone()[0]
+    if has_rows and not has_rollups:
+        rebuild_rollups(cursor)
+
+def _keys(user_id, date, category):
+    return (
+        (user_id,),
+        (user_id, date[:7]),
+        (user_id, category or "General"),
+    )
+
+def apply_rollups(cursor, rows):
+    """
+    Adds a batch of new business_data rows to the rollups.
+    rows: iterable of (user_id, date, revenue, expenses, inventory_cost, category).
+    Deltas are summed in memory first, so each rollup row is written once per batch.
+    """
+    deltas = [{} for _ in ROLLUPS]
+    for user_id, date, rev, exp, inv, cat in rows:
+        for bucket, key in zip(deltas, _keys(user_id, date, cat)):
+            d = bucket.setdefault(key, [0.0, 0.0, 0.0, 0])
+            d[0] += rev or 0
+            d[1] += exp or 0
+            d[2] += inv or 0
+            d[3] += 1
+
+    for (table, key_cols, _), bucket in zip(ROLLUPS, deltas):
+        if not bucket:
+            continue
+        cols = ", ".join(key_cols)
+        marks = ", ".join("?" for _ in key_cols)
+        cursor.executemany(f"""
+            INSERT INTO {table} ({cols}, revenue, expenses, inventory_cost, row_count)
+            VALUES ({marks}, ?, ?, ?, ?)
+            ON CONFLICT ({cols}) DO UPDATE SET
+                revenue = revenue + excluded.revenue,
+                expenses = expenses + excluded.expenses,
+                inventory_cost = inventory_cost + excluded.inventory_cost,
+                row_count = row_count + excluded.row_count
+        """, [key + tuple(d) for key, d in bucket.items()])
+
+def _aggregate_sql(key_exprs, key_cols):
+    select = ", ".join(f"{expr} AS {col}" for expr, col in zip(key_exprs, key_cols))
+    group = ", ".join(key_exprs)
+    return f"""
+        SELECT {select}, SUM(revenue), SUM(expenses), SUM(inventory_cost), COUNT(*)
+        FROM business_data
+        GROUP BY {group}
+    """
+
+def rebuild_rollups(cursor):
+    """Recomputes every rollup table from the raw business_data rows."""
+    for table, key_cols, key_exprs in ROLLUPS:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"""
+            INSERT INTO {table} ({", ".join(key_cols)}, revenue, expenses, inventory_cost, row_count)
+            {_aggregate_sql(key_exprs, key_cols)}
+        """)
+
+def _close(a, b):
+    return abs((a or 0) - (b or 0)) <= TOLERANCE * max(1.0, abs(a or 0), abs(b or 0))
+
+def verify_rollups(cursor):
+    """Returns a list of (table, key, expected, actual) for rollup rows that disagree with business_data."""
+    mismatches = []
+    for table, key_cols, key_exprs in ROLLUPS:
+        n = len(key_cols)
+        expected = {row[:n]: row[n:] for row in cursor.execute(_aggregate_sql(key_exprs, key_cols))}
+        actual = {
+            row[:n]: row[n:]
+            for row in cursor.execute(
+                f"SELECT {', '.join(key_cols)}, revenue, expenses, inventory_cost, row_count FROM {table}"
+            )
+        }
+        for key in expected.keys() | actual.keys():
+            exp_vals = expected.get(key)
+            act_vals = actual.get(key)
+            if exp_vals is None or act_vals is None or exp_vals[3] != act_vals[3] \
+                    or not all(_close(a, b) for a, b in zip(exp_vals[:3], act_vals[:3])):
+                mismatches.append((table, key, exp_vals, act_vals))
+    return mismatches
+
+
+if __name__ == "__main__":
+    from utils.db import data_databases, get_connection, init_db
+
+    init_db()
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command not in ("verify", "rebuild"):
+        print("usage: python -m utils.rollups [verify|rebuild]")
+        sys.exit(2)
+    problems = []
+    for database in data_databases():
+        conn = get_connection(database=database)
+        try:
+            cur = conn.cursor()
+            if command == "rebuild":
+                rebuild_rollups(cur)
+                conn.commit()
+                print(f"Rollups rebuilt from business_data in {database}.")
+            else:
+                found = verify_rollups(cur)
+                for table, key, expected, actual in found[:50]:
+                    print(f"MISMATCH {database} {table} {key}: expected {expected}, found {actual}")
+                problems.extend(found)
+        finally:
+            conn.close()
+    if command == "verify":
+        print(f"{len(problems)} mismatched rollup rows.")
+        sys.exit(1 if problems else 0)
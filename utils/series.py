@@ -0,0 +1,248 @@
+"""
+Columnar in-memory copies of users' business_data for /trends and /forecast.
+
+A user's rows are loaded on first use into NumPy columns in (date, id) order:
+dates as datetime64[D], amounts as float64 (NaN for NULL) and categories as
+int32 codes into a per-user list of names. Requests slice and reduce those
+arrays and build dicts only for the points they return. insert_records() reports
+every committed batch (see utils.db.set_insert_observer) and loaded series are
+appended to in place. Each read first checks the user's row_count in
+user_totals, so rows written by another worker or process are caught up with
+one indexed query. Once the columns exceed SERIES_MEMORY_MB the least recently
+used series are evicted; SERIES_MEMORY_MB=0 turns the store off and /trends
+reads SQLite directly.
+"""
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from utils.db import get_connection, set_insert_observer
+
+SERIES_MEMORY_MB = float(os.environ.get("SERIES_MEMORY_MB", 64))
+
+# Rows fetched per round trip while loading a series
+LOAD_BATCH = 10000
+
+COUNT_SQL = "SELECT row_count FROM user_totals WHERE user_id = ?"
+
+ROWS_SQL = """
+    SELECT id, date, revenue, expenses, inventory_cost, category
+    FROM business_data
+    WHERE user_id = ? AND id > ?
+    ORDER BY date, id
+"""
+
+# Read-only views of one user's rows; codes index into categories
+Columns = namedtuple("Columns", "ids days revenue expenses inventory codes categories")
+
+DTYPES = (np.int64, "datetime64[D]", np.float64, np.float64, np.float64, np.int32)
+
+
+class UserSeries:
+    """One user's rows as growable columns kept sorted by (date, id)."""
+
+    def __init__(self):
+        self.size = 0
+        self.max_id = 0
+        self.categories = []
+        self._codes = {}
+        self._cols = [np.empty(0, dtype) for dtype in DTYPES]
+        # user_totals.row_count and the highest id as of the last read from SQLite
+        self.synced_count = 0
+        self.synced_id = 0
+        self.charged = 0  # bytes counted against the store budget
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self._cols) + 64 * len(self.categories)
+
+    def columns(self):
+        return Columns(*(col[:self.size] for col in self._cols), self.categories)
+
+    def to_arrays(self, rows):
+        """(id, date, revenue, expenses, inventory_cost, category) rows to column arrays."""
+        n = len(rows)
+        codes = self._codes
+        for row in rows:
+            if row[5] not in codes:
+                codes[row[5]] = len(self.categories)
+                self.categories.append(row[5])
+        return (
+            np.fromiter((row[0] for row in rows), np.int64, n),
+            np.array([row[1] for row in rows], dtype="datetime64[D]"),
+            np.array([row[2] for row in rows], dtype=np.float64),  # None becomes NaN
+            np.array([row[3] for row in rows], dtype=np.float64),
+            np.array([row[4] for row in rows], dtype=np.float64),
+            np.fromiter((codes[row[5]] for row in rows), np.int32, n),
+        )
+
+    def extend(self, arrays):
+        """
+        Adds the rows not already present and returns how many that was. Views
+        handed out by columns() earlier are never modified.
+        """
+        ids, days = arrays[0], arrays[1]
+        if ids.size and ids.min() <= self.max_id:
+            fresh = ~np.isin(ids, self._cols[0][:self.size])
+            if not fresh.all():
+                arrays = tuple(col[fresh] for col in arrays)
+                ids, days = arrays[0], arrays[1]
+        n = ids.size
+        if not n:
+            return 0
+        tail = self.size
+        # ids ascend within a batch, so a batch in date order is in (date, id) order
+        in_order = bool(np.all(days[1:] >= days[:-1])) and (tail == 0 or days[0] > self._cols[1][tail - 1] or (
+            days[0] == self._cols[1][tail - 1] and ids[0] > self._cols[0][tail - 1]))
+        if in_order:
+            # The common case, a record for today: write past the end, growing by doubling
+            if tail + n > self._cols[0].size:
+                capacity = max(2 * self._cols[0].size, tail + n, 64)
+                grown = []
+                for col in self._cols:
+                    new = np.empty(capacity, col.dtype)
+                    new[:tail] = col[:tail]
+                    grown.append(new)
+                self._cols = grown
+            for col, values in zip(self._cols, arrays):
+                col[tail:tail + n] = values
+        else:
+            merged = [np.concatenate((col[:tail], values)) for col, values in zip(self._cols, arrays)]
+            order = np.lexsort((merged[0], merged[1]))
+            self._cols = [col[order] for col in merged]
+        self.size = tail + n
+        self.max_id = max(self.max_id, int(ids.max()))
+        return n
+
+
+class SeriesStore:
+    """LRU of UserSeries bounded by the bytes their columns take."""
+
+    def __init__(self, budget_mb=SERIES_MEMORY_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.nbytes = 0
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "loads": 0, "catchups": 0, "appended": 0, "evictions": 0}
+
+    @property
+    def enabled(self):
+        return self.budget > 0
+
+    def get(self, user_id, load=True):
+        """
+        Columns of the user's rows, current as of this call. Loads the series on first
+        use; with load=False returns None instead. None whenever the store is off.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            series = self._series.get(user_id)
+            if series is not None:
+                self._series.move_to_end(user_id)
+        if series is None and not load:
+            return None
+
+        conn = get_connection(user_id)
+        try:
+            if series is not None:
+                row = conn.execute(COUNT_SQL, (user_id,)).fetchone()
+                with self._lock:
+                    if series.synced_count == (row[0] if row else 0):
+                        self._stats["hits"] += 1
+                        return series.columns()
+            # Count and rows come from one read snapshot, so they agree with each other.
+            # Rows committed later get higher ids, so id > synced_id catches up exactly.
+            conn.execute("BEGIN")
+            row = conn.execute(COUNT_SQL, (user_id,)).fetchone()
+            count = row[0] if row else 0
+            rows = self._fetch(conn, user_id, series.synced_id if series is not None else 0)
+        finally:
+            conn.close()
+
+        fresh = series is None
+        try:
+            if fresh:
+                # Not shared yet, so the slow part runs outside the lock
+                series = UserSeries()
+                series.extend(series.to_arrays(rows))
+            with self._lock:
+                if not fresh:
+                    series.extend(series.to_arrays(rows))
+                series.synced_count = count
+                if rows:
+                    series.synced_id = max(series.synced_id, max(row[0] for row in rows))
+                self._stats["loads" if fresh else "catchups"] += 1
+                self._keep(user_id, series)
+                return series.columns()
+        except ValueError:
+            # A date numpy cannot parse (legacy data): this user is served from SQLite
+            with self._lock:
+                self._discard(user_id)
+            return None
+
+    def _fetch(self, conn, user_id, after_id):
+        cur = conn.execute(ROWS_SQL, (user_id, after_id))
+        rows = []
+        while True:
+            batch = cur.fetchmany(LOAD_BATCH)
+            if not batch:
+                return rows
+            rows.extend(batch)
+
+    def _keep(self, user_id, series):
+        self._discard(user_id)
+        if series.nbytes > self.budget:
+            return  # bigger than the whole budget: serve it once, do not keep it
+        series.charged = series.nbytes
+        self._series[user_id] = series
+        self.nbytes += series.charged
+        self._evict()
+
+    def _discard(self, user_id):
+        old = self._series.pop(user_id, None)
+        if old is not None:
+            self.nbytes -= old.charged
+
+    def _evict(self):
+        while self.nbytes > self.budget and self._series:
+            _, evicted = self._series.popitem(last=False)
+            self.nbytes -= evicted.charged
+            self._stats["evictions"] += 1
+
+    def on_insert(self, rows, first_id):
+        """Insert observer: appends a committed batch to the series already in memory."""
+        with self._lock:
+            by_user = {}
+            for i, (user_id, date, revenue, expenses, inventory_cost, category) in enumerate(rows):
+                if user_id in self._series:
+                    by_user.setdefault(user_id, []).append(
+                        (first_id + i, date, revenue, expenses, inventory_cost, category))
+            for user_id, user_rows in by_user.items():
+                series = self._series[user_id]
+                try:
+                    added = series.extend(series.to_arrays(user_rows))
+                except Exception:
+                    # Dropped rather than left behind; the next read reloads it from SQLite
+                    self._discard(user_id)
+                    continue
+                # The rollup counted these rows in the same commit
+                series.synced_count += added
+                self.nbytes += series.nbytes - series.charged
+                series.charged = series.nbytes
+                self._stats["appended"] += added
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, users=len(self._series), bytes=self.nbytes, budget=self.budget)
+
+
+series_store = SeriesStore()
+
+
+def init_app(app):
+    """Keeps loaded series current with every record this process commits."""
+    set_insert_observer(series_store.on_insert)
@@ -0,0 +1,69 @@
+"""
+Maps each tenant (user_id) to one of SHARD_COUNT SQLite files.
+
+A consistent-hash ring with SHARD_VNODES points per shard keeps the mapping
+stable when the count changes: going from N to N+1 shards moves about 1/(N+1)
+of the users, and `python -m utils.rebalance` moves exactly those. The users
+table and schema version stay in the directory database (DATABASE_PATH).
+With SHARD_COUNT unset, 0 or 1 everything lives in DATABASE_PATH as before.
+"""
+import bisect
+import hashlib
+import os
+
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 0))
+SHARD_DIR = os.environ.get("SHARD_DIR", "shards")
+
+# Points per shard on the ring; more points spread users more evenly
+SHARD_VNODES = int(os.environ.get("SHARD_VNODES", 64))
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over a list of node names."""
+
+    def __init__(self, nodes, vnodes=SHARD_VNODES):
+        points = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(vnodes)
+        )
+        self.nodes = list(nodes)
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """Node owning the first ring point at or after hash(key), wrapping at the end."""
+        i = bisect.bisect(self._keys, _hash(str(key)))
+        return self._nodes[i % len(self._nodes)]
+
+
+def shard_names(count=SHARD_COUNT):
+    """Ring node names; hashing names rather than paths lets SHARD_DIR move freely."""
+    return [f"shard-{i:02d}" for i in range(count)]
+
+
+def shard_paths(count=SHARD_COUNT, directory=SHARD_DIR):
+    """Database files of a `count`-shard layout."""
+    return [os.path.join(directory, f"{name}.db") for name in shard_names(count)]
+
+
+def enabled(count=SHARD_COUNT):
+    return count > 1
+
+
+def make_router(count=SHARD_COUNT, directory=SHARD_DIR):
+    """Returns route(user_id) -> database path for a `count`-shard layout."""
+    ring = HashRing(shard_names(count))
+    return lambda user_id: os.path.join(directory, f"{ring.node_for(user_id)}.db")
+
+
+_route = make_router() if enabled() else None
+
+
+def database_for(user_id):
+    """Shard file holding this user's data, or None when sharding is off."""
+    return _route(user_id) if _route else None
@@ -1,107 +1,60 @@
-# Dictionary containing all translations for the application
-LANGUAGES = {
-    'en': {
-        'nav_dashboard': 'Dashboard',
-        'nav_analytics': 'Analytics',
-        'nav_trends': 'Trends',
-        'nav_health': 'Health',
-        'nav_alerts': 'Alerts',
-        'nav_login': 'Login',
-        
-        'hero_title_start': 'Decode your',
-        'hero_highlight': 'business',
-        'hero_title_end': 'in seconds',
-        'hero_desc': 'Your data, simplified—track growth, spot risks, and act faster.',
-        
-        # Updated English text for the button
-        'btn_enter': 'Start Analyzing My Business',
-        'btn_demo': 'View Demo',
-        
-        'feat1_title': 'Cash Flow Overview',
-        'feat1_desc': "Track your revenue, expenses, and net profit in one simple view. Instantly see whether you're operating at a profit or loss.",
-        'feat2_title': 'Monthly Growth Tracking',
-        'feat2_desc': 'Monitor month-over-month changes in revenue and expenses to understand growth patterns and identify unusual shifts early.',
-        'feat3_title': 'Business Health Score',
-        'feat3_desc': 'Get a simple health rating based on profit margin, cash flow stability, and growth trends — with clear signals: Stable, Monitor, or At Risk.',
-        'feat4_title': 'Early Risk Alerts',
-        'feat4_desc': 'Get early warnings when expenses spike, profit margins decline, or inventory buildup begins to impact your cash flow — before it becomes critical.',
-        
-        'footer_text': '© 2026 BizHealth Analytics. Built with Flask, SQLite & Chart.js',
-        
-        'welcome_back': 'Welcome back',
-        'dashboard_subtitle': "Here's what's happening with your business today.",
-        'total_revenue': 'Total Revenue',
-        'total_expenses': 'Total Expenses',
-        'net_profit': 'Net Profit',
-        'health_score': 'Health Score',
-        'revenue_vs_expenses': 'Revenue vs Expenses',
-        'cash_flow_monthly': 'Track your cash flow monthly',
-        'recent_transactions': 'Recent Transactions',
-        'view_all': 'View all',
-        'add_new_record': 'Add New Record',
-        'date': 'Date',
-        'revenue': 'Revenue',
-        'expenses': 'Expenses',
-        'inventory_cost': 'Inventory Cost',
-        'category': 'Category',
-        'save_record': 'Save Record',
-        'risk_insights': 'Risk Insights',
-        'analyzing_patterns': 'Analyzing financial patterns...',
-        'everything_great': 'Everything looks great! No risk alerts detected.',
-        'profitable': 'Profitable',
-        'loss': 'Loss',
-        'status': 'Status'
-    },
-    'as': {
-        'nav_dashboard': 'ডেশ্ববৰ্ড',
-        'nav_analytics': 'এনালাইটিক্স',
-        'nav_trends': 'ট্ৰেণ্ডসমূহ',
-        'nav_health': 'স্বাস্থ্য',
-        'nav_alerts': 'এলাৰ্টসমূহ',
-        'nav_login': 'লগ ইন',
-        'nav_register': 'বিনামূলীয়াকৈ আৰম্ভ কৰক',
-        
-        'hero_title_start': 'আপোনাৰ',
-        'hero_highlight': 'ব্যৱসায় সুস্থ নেকি',
-        'hero_title_end': 'মাত্ৰ কেইমিনিট মানত জানক',
-        'hero_desc': 'আপোনাৰ দৰে সৰু ব্যৱসায়ীসকলে প্ৰতিদিনে উপাৰ্জন আৰু ব্যয়ৰ হিচাপ ৰাখে, কিন্তু ব্যৱসায়টো প্ৰকৃততে বৃদ্ধি পাইছে নে বিপদত আছে সেয়া প্ৰায়ে নাজানে। এই ডেশ্ববৰ্ডে আপোনাৰ তথ্যসমূহক সৰল বিকাশৰ সংকেত, বিপদৰ এলাৰ্ট, আৰু স্পষ্ট স্বাস্থ্য স্ক\'ৰলৈ পৰিৱৰ্তন কৰে, যাতে আপুনি সোনকালেই ব্যৱস্থা গ্ৰহণ কৰিব পাৰে।',
-        
-        'btn_enter': 'মোৰ ব্যৱসায় বিশ্লেষণ আৰম্ভ কৰক',
-        'btn_demo': 'ডেমো চাওক',
-        
-        'feat1_title': 'কেছ ফ্ল\' অ\'ভাৰভিউ',
-        'feat1_desc': 'আপোনাৰ উপাৰ্জন, ব্যয়, আৰু মুঠ লাভ এটা সৰল দৃশ্যত ট্ৰেক কৰক। আপুনি লাভ নে লোকচানত চলি আছে সেয়া লগে লগে চাওক।',
-        'feat2_title': 'মাহিলী বিকাশৰ ট্ৰেকিং',
-        'feat2_desc': 'বিকাশৰ আৰ্হি বুজিবলৈ আৰু অস্বাভাৱিক পৰিৱৰ্তনসমূহ সোনকালে চিনাক্ত কৰিবলৈ উপাৰ্জন আৰু ব্যয়ৰ মাহেকীয়া পৰিৱৰ্তনসমূহ নিৰীক্ষণ কৰক।',
-        'feat3_title': 'ব্যৱসায়িক স্বাস্থ্যৰ স্ক\'ৰ',
-        'feat3_desc': 'লাভৰ হাৰ, নগদ ধনৰ প্ৰবাহৰ স্থিৰতা আৰু বিকাশৰ ধাৰাৰ ওপৰত ভিত্তি কৰি এটা সৰল স্বাস্থ্য ৰেটিং পাওক — স্পষ্ট সংকেতৰ সৈতে: সুস্থিৰ, নিৰীক্ষণ কৰক, বা বিপদত।',
-        'feat4_title': 'আগতীয়া বিপদৰ এলাৰ্ট',
-        'feat4_desc': 'ব্যয় বৃদ্ধি পালে, লাভৰ হাৰ কমিলে বা ইনভেণ্টৰী জমা হৈ নগদ ধনৰ প্ৰবাহত প্ৰভাৱ পেলালে পৰিস্থিতি বেয়া হোৱাৰ আগতেই আগতীয়া সতৰ্কবাণী পাওক।',
-        
-        'footer_text': '© 2026 BizHealth Analytics. ফ্লাস্ক, SQLite আৰু Chart.js ৰ দ্বাৰা নিৰ্মিত',
+"""
+Translation catalogs.
 
-        'welcome_back': 'আদৰণি জনাইছোঁ',
-        'dashboard_subtitle': "আজি আপোনাৰ ব্যৱসায়ত কি ঘটিছে সেয়া ইয়াত আছে।",
-        'total_revenue': 'মুঠ উপাৰ্জন',
-        'total_expenses': 'মুঠ ব্যয়',
-        'net_profit': 'মুঠ লাভ',
-        'health_score': 'স্বাস্থ্যৰ স্ক\'ৰ',
-        'revenue_vs_expenses': 'উপাৰ্জন বনাম ব্যয়',
-        'cash_flow_monthly': 'আপোনাৰ মাহেকীয়া নগদ ধনৰ প্ৰবাহ ট্ৰেক কৰক',
-        'recent_transactions': 'শেহতীয়া লেনদেনসমূহ',
-        'view_all': 'সকলো চাওক',
-        'add_new_record': 'নতুন ৰেকৰ্ড যোগ কৰক',
-        'date': 'তাৰিখ',
-        'revenue': 'উপাৰ্জন',
-        'expenses': 'ব্যয়',
-        'inventory_cost': 'ইনভেণ্টৰী খৰচ',
-        'category': 'শ্ৰেণী',
-        'save_record': 'ৰেকৰ্ড সংৰক্ষণ কৰক',
-        'risk_insights': 'বিপদৰ অন্তৰ্দৃষ্টি',
-        'analyzing_patterns': 'আৰ্থিক আৰ্হি বিশ্লেষণ কৰা হৈছে...',
-        'everything_great': 'সকলো ঠিকেই আছে! কোনো বিপদৰ সংকেত পোৱা হোৱা নাই।',
-        'profitable': 'লাভজনক',
-        'loss': 'লোকচান',
-        'status': 'স্থিতি'
-    }
-}
\ No newline at end of file
+Each language lives in config/translations/<code>.json (or the directory named by
+TRANSLATIONS_DIR). Catalogs are compiled once at import: every language is merged
+over its fallback chain ("as-IN" -> "as" -> "en") and frozen, so a render just looks
+up one ready-made mapping and templates never need per-key defaults.
+"""
+import json
+import os
+from types import MappingProxyType
+
+CATALOG_DIR = os.environ.get(
+    "TRANSLATIONS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "translations"),
+)
+
+DEFAULT_LANGUAGE = "en"
+
+def load_catalogs(directory=CATALOG_DIR):
+    """Reads every <code>.json catalog in the directory into {code: {key: text}}."""
+    catalogs = {}
+    for name in sorted(os.listdir(directory)):
+        code, ext = os.path.splitext(name)
+        if ext != ".json":
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            catalogs[code] = json.load(f)
+    if DEFAULT_LANGUAGE not in catalogs:
+        raise ValueError(f"Missing {DEFAULT_LANGUAGE}.json in {directory}")
+    return catalogs
+
+def fallback_chain(code, catalogs):
+    """Languages consulted for a code, most specific first and always ending in English."""
+    chain = []
+    parts = code.split("-")
+    for i in range(len(parts), 0, -1):
+        candidate = "-".join(parts[:i])
+        if candidate in catalogs and candidate not in chain:
+            chain.append(candidate)
+    if DEFAULT_LANGUAGE not in chain:
+        chain.append(DEFAULT_LANGUAGE)
+    return chain
+
+def compile_catalogs(catalogs):
+    """Merges each catalog over its fallbacks and freezes the result."""
+    compiled = {}
+    for code in catalogs:
+        merged = {}
+        for fallback in reversed(fallback_chain(code, catalogs)):
+            merged.update(catalogs[fallback])
+        compiled[code] = MappingProxyType(merged)
+    return MappingProxyType(compiled)
+
+# Dictionary containing all translations for the application, keyed by language code
+LANGUAGES = compile_catalogs(load_catalogs())
+
+def get_catalog(lang):
+    """Returns the merged catalog for a language, or English if it is unknown."""
+    return LANGUAGES.get(lang) or LANGUAGES[DEFAULT_LANGUAGE]
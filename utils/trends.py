@@ -0,0 +1,270 @@
+"""
+Query helpers behind /trends: date windows, keyset pagination, calendar
+bucketing and LTTB point reduction, so chart payloads stay bounded no matter
+how much history a user has. Each runs on the user's columns in the series
+store (utils/series.py) when it is on, and as SQL otherwise.
+"""
+import base64
+
+import numpy as np
+
+from utils.db import get_connection, normalize_date
+from utils.series import series_store
+
+MAX_PAGE_SIZE = 5000
+
+# Bucket key expressions; each bucket is labelled with its first day
+BUCKETS = {
+    "day": "date",
+    "week": "date(date, 'weekday 0', '-6 days')",  # Monday of the ISO week
+    "month": "substr(date, 1, 7) || '-01'",
+}
+
+ROWS_SQL = """
+    SELECT id, date, revenue, expenses, category
+    FROM business_data
+    WHERE user_id = :user_id
+      AND date >= :start AND date <= :end
+      AND (date, id) > (:after_date, :after_id)
+    ORDER BY date, id
+    LIMIT :limit
+"""
+
+BUCKET_SQL = """
+    SELECT {key} AS bucket, SUM(revenue), SUM(expenses), COUNT(*)
+    FROM business_data
+    WHERE user_id = :user_id
+      AND date >= :start AND date <= :end
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+def encode_cursor(date, row_id):
+    return base64.urlsafe_b64encode(f"{date}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Returns (date, id) from an opaque cursor; raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return normalize_date(date), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def parse_trend_args(args):
+    """
+    Validates /trends query parameters. Raises ValueError with a user-facing message.
+    Returns a dict with start, end, bucket, points, limit and cursor.
+    """
+    opts = {
+        "start": normalize_date(args["start"]) if args.get("start") else "0000-01-01",
+        "end": normalize_date(args["end"]) if args.get("end") else "9999-12-31",
+        "bucket": args.get("bucket") or None,
+        "points": None,
+        "limit": None,
+        "cursor": args.get("cursor") or None,
+    }
+    if opts["bucket"] is not None and opts["bucket"] not in BUCKETS:
+        raise ValueError(f"bucket must be one of {sorted(BUCKETS)}")
+    for name in ("points", "limit"):
+        if args.get(name):
+            try:
+                opts[name] = int(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be an integer")
+            if opts[name] < 1:
+                raise ValueError(f"{name} must be positive")
+    if opts["points"] is not None and opts["points"] < 3:
+        raise ValueError("points must be at least 3")
+    if opts["limit"] is not None:
+        if opts["bucket"] or opts["points"]:
+            raise ValueError("limit/cursor pagination cannot be combined with bucket or points")
+        opts["limit"] = min(opts["limit"], MAX_PAGE_SIZE)
+    if opts["cursor"] is not None:
+        if opts["limit"] is None:
+            raise ValueError("cursor requires limit")
+        decode_cursor(opts["cursor"])
+    return opts
+
+def window(columns, start, end, after_date="", after_id=0):
+    """Index range [lo, hi) of the rows inside start..end and after the (date, id) cursor."""
+    days, ids = columns.days, columns.ids
+    lo = int(np.searchsorted(days, np.datetime64(start), "left"))
+    hi = int(np.searchsorted(days, np.datetime64(end), "right"))
+    if after_date:
+        after = np.datetime64(after_date)
+        i = int(np.searchsorted(days, after, "left"))
+        j = int(np.searchsorted(days, after, "right"))
+        lo = max(lo, i + int(np.searchsorted(ids[i:j], after_id, "right")))
+    return lo, max(lo, hi)
+
+def _floats(values):
+    out = values.tolist()
+    if np.isnan(values).any():
+        out = [None if v != v else v for v in out]  # NaN stands for NULL
+    return out
+
+def records(columns, index):
+    """Builds the row dicts for a slice or index array of the columns."""
+    categories = columns.categories
+    return [
+        {"date": d, "revenue": r, "expenses": e, "category": c}
+        for d, r, e, c in zip(
+            columns.days[index].astype(str).tolist(),
+            _floats(columns.revenue[index]),
+            _floats(columns.expenses[index]),
+            [categories[code] for code in columns.codes[index].tolist()],
+        )
+    ]
+
+def fetch_rows(user_id, start, end, limit=None, cursor=None):
+    """Raw rows in date order; returns (rows, next_cursor)."""
+    after_date, after_id = decode_cursor(cursor) if cursor else ("", 0)
+    columns = series_store.get(user_id)
+    if columns is not None:
+        lo, hi = window(columns, start, end, after_date, after_id)
+        next_cursor = None
+        if limit and hi - lo > limit:
+            hi = lo + limit
+            next_cursor = encode_cursor(str(columns.days[hi - 1]), int(columns.ids[hi - 1]))
+        return records(columns, slice(lo, hi)), next_cursor
+
+    # Seeking the index to the cursor date keeps deep pages as cheap as the first
+    start = max(start, after_date)
+    conn = get_connection(user_id)
+    try:
+        rows = conn.execute(ROWS_SQL, {
+            "user_id": user_id, "start": start, "end": end,
+            "after_date": after_date, "after_id": after_id,
+            "limit": (limit + 1) if limit else -1,
+        }).fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    data = [{"date": r[1], "revenue": r[2], "expenses": r[3], "category": r[4]} for r in rows]
+    return data, next_cursor
+
+def _sums(values, starts):
+    """Per-run sums like SQL SUM(): NULLs skipped, None for a run with no values."""
+    missing = np.isnan(values)
+    sums = np.add.reduceat(np.where(missing, 0.0, values), starts).tolist()
+    if missing.any():
+        present = np.add.reduceat(~missing, starts, dtype=np.int64).tolist()
+        sums = [total if n else None for total, n in zip(sums, present)]
+    return sums
+
+def bucket_keys(days, bucket):
+    """First day of each date's bucket, matching the SQL expressions in BUCKETS."""
+    if bucket == "week":
+        # 1970-01-01 was a Thursday, three days after a Monday
+        return days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    if bucket == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+def fetch_buckets(user_id, start, end, bucket):
+    """Per-day/week/month sums in date order."""
+    columns = series_store.get(user_id)
+    if columns is not None:
+        lo, hi = window(columns, start, end)
+        if lo == hi:
+            return []
+        keys = bucket_keys(columns.days[lo:hi], bucket)
+        # Dates are sorted, so each bucket is one run of equal keys
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        counts = np.diff(np.append(starts, hi - lo))
+        return [
+            {"date": d, "revenue": r, "expenses": e, "count": n}
+            for d, r, e, n in zip(keys[starts].astype(str).tolist(), _sums(columns.revenue[lo:hi], starts),
+                                  _sums(columns.expenses[lo:hi], starts), counts.tolist())
+        ]
+
+    conn = get_connection(user_id)
+    try:
+        rows = conn.execute(BUCKET_SQL.format(key=BUCKETS[bucket]), {
+            "user_id": user_id, "start": start, "end": end,
+        }).fetchall()
+    finally:
+        conn.close()
+    return [{"date": r[0], "revenue": r[1], "expenses": r[2], "count": r[3]} for r in rows]
+
+def _lttb(values, threshold):
+    picked = np.empty(threshold, dtype=np.int64)
+    n = values.size
+    picked[0], picked[-1] = 0, n - 1
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = values[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ay = values[a]
+        area = np.abs((a - avg_x) * (values[start:end] - ay) - (a - np.arange(start, end)) * (avg_y - ay))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+def lttb_indices(values, threshold, others=()):
+    """
+    Largest-Triangle-Three-Buckets reduction of a series to `threshold` points.
+    Returns the indices kept, first and last included; NaN counts as 0. The
+    minimum and maximum of `values` and of each series in `others` are always
+    kept, so peaks read off the reduced points are exact.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    n = values.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    extremes = set()
+    for series in (values, *others):
+        series = np.nan_to_num(np.asarray(series, dtype=np.float64))
+        extremes.update((int(np.argmin(series)), int(np.argmax(series))))
+    extremes = np.array(sorted(extremes - {0, n - 1}), dtype=np.int64)
+    # Leave room for the extremes; the result stays within threshold unless threshold < 7
+    return np.union1d(_lttb(values, max(3, threshold - extremes.size)), extremes)
+
+def lttb(points, threshold, value="revenue", others=("expenses",)):
+    """
+    Largest-Triangle-Three-Buckets reduction of a date-ordered list of dicts to
+    `threshold` points, keeping the shape of the `value` series (first and last
+    kept) and the extremes of `value` and of the `others` fields.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+    indices = lttb_indices([p[value] or 0 for p in points], threshold,
+                           [[p[name] or 0 for p in points] for name in others])
+    return [points[i] for i in indices.tolist()]
+
+def get_trends(user_id, opts):
+    """
+    Builds the /trends payload. Without limit it is a list of points (as before);
+    with limit it is {"items": [...], "next_cursor": str | None}.
+    """
+    if opts["limit"]:
+        items, next_cursor = fetch_rows(user_id, opts["start"], opts["end"], opts["limit"], opts["cursor"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    if opts["points"] and not opts["bucket"]:
+        columns = series_store.get(user_id)
+        if columns is not None:
+            # Reduce on the columns and build dicts only for the points kept
+            lo, hi = window(columns, opts["start"], opts["end"])
+            return records(columns, lo + lttb_indices(columns.revenue[lo:hi], opts["points"], (columns.expenses[lo:hi],)))
+
+    if opts["bucket"]:
+        data = fetch_buckets(user_id, opts["start"], opts["end"], opts["bucket"])
+    else:
+        data, _ = fetch_rows(user_id, opts["start"], opts["end"])
+    if opts["points"]:
+        data = lttb(data, opts["points"])
+    return data
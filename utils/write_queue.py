@@ -0,0 +1,226 @@
+"""
+Write-coalescing ingestion for /add-data.
+
+With INGEST_MODE=direct (the default) every record is inserted and committed by the
+request that submitted it. With INGEST_MODE=queued, validated records go onto a
+bounded in-process queue and one writer thread per worker inserts them in group
+commits: it takes whatever queued up while the previous commit ran (up to
+INGEST_BATCH_SIZE rows, optionally waiting INGEST_FLUSH_MS for more) and writes them,
+with their rollup updates, in one transaction.
+
+INGEST_ACK decides when the client gets its answer in queued mode:
+  commit  - after the group commit containing the record (201, same guarantee as direct)
+  enqueue - as soon as the record is queued (202); records still queued are lost if
+            the worker crashes, and reads may briefly not include them.
+When the queue is full, writers wait up to INGEST_ENQUEUE_TIMEOUT seconds and then get
+IngestBusyError (the route answers 503) instead of piling up unbounded work.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from utils.cache import response_cache
+from utils.db import PartialInsertError, insert_records
+from utils.events import broker
+
+INGEST_MODE = os.environ.get("INGEST_MODE", "direct")
+INGEST_ACK = os.environ.get("INGEST_ACK", "commit")
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 10000))
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 1000))
+# Extra wait for more rows before a commit. 0 batches only what is already queued, which is
+# best when clients wait for their commit; a few ms helps ack-after-enqueue trickle loads
+INGEST_FLUSH_MS = float(os.environ.get("INGEST_FLUSH_MS", 0))
+INGEST_ENQUEUE_TIMEOUT = float(os.environ.get("INGEST_ENQUEUE_TIMEOUT", 0.5))
+# How long an ack-after-commit request waits for its batch before giving up
+INGEST_COMMIT_TIMEOUT = float(os.environ.get("INGEST_COMMIT_TIMEOUT", 10))
+
+logger = logging.getLogger(__name__)
+
+
+class IngestBusyError(Exception):
+    """Raised when the ingestion queue is full."""
+
+
+class WriteQueue:
+    """
+    Inserts (user_id, date, revenue, expenses, inventory_cost, category) rows, either
+    directly or through a writer thread that group-commits them.
+    """
+
+    _STOP = object()
+
+    def __init__(self, mode=INGEST_MODE, ack=INGEST_ACK, maxsize=INGEST_QUEUE_SIZE,
+                 batch_size=INGEST_BATCH_SIZE, flush_ms=INGEST_FLUSH_MS,
+                 enqueue_timeout=INGEST_ENQUEUE_TIMEOUT):
+        if mode not in ("direct", "queued"):
+            raise ValueError(f"Unknown INGEST_MODE: {mode!r}")
+        if ack not in ("commit", "enqueue"):
+            raise ValueError(f"Unknown INGEST_ACK: {ack!r}")
+        self.mode = mode
+        self.ack = ack
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_window = flush_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stats = {"submitted": 0, "committed": 0, "batches": 0, "rejected": 0, "failed": 0}
+
+    def write(self, row):
+        """
+        Stores one validated row. Returns True once it is committed, or False if it was
+        only queued (INGEST_ACK=enqueue, or the commit outlasted INGEST_COMMIT_TIMEOUT and
+        the row may still be written, so the client must not resend it).
+        Raises IngestBusyError when the queue is full.
+        """
+        if self.mode == "direct":
+            insert_records([row])
+            self._after_commit(row[0], [row])
+            with self._lock:
+                self._stats["submitted"] += 1
+                self._stats["committed"] += 1
+                self._stats["batches"] += 1
+            return True
+
+        future = Future() if self.ack == "commit" else None
+        try:
+            self._started().put((row, future), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count("rejected")
+            raise IngestBusyError("Too many records are waiting to be saved. Please try again.")
+        self._count("submitted")
+        if future is None:
+            return False
+        try:
+            return future.result(timeout=INGEST_COMMIT_TIMEOUT)
+        except FutureTimeoutError:
+            return False
+
+    def _after_commit(self, user_id, rows):
+        """Invalidates caches and notifies live streams; the rows are saved whatever happens here."""
+        try:
+            response_cache.invalidate_user(user_id)
+            broker.publish_records(user_id, rows)
+        except Exception:
+            logger.exception("post-commit update failed for %s", user_id)
+
+    def _started(self):
+        # Lazily per process: a writer thread does not survive a gunicorn fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue(self.maxsize)
+                self._thread = None
+                atexit.register(self.close)
+            if self._thread is None or not self._thread.is_alive():
+                # First write in this process, or the writer died: (re)start it on the same queue
+                self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self._thread.start()
+            return self._queue
+
+    def _run(self):
+        q = self._queue
+        while True:
+            item = q.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.flush_window
+            while len(batch) < self.batch_size:
+                try:
+                    # Whatever piled up during the last commit is taken without waiting
+                    item = q.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._flush(batch)
+            except Exception:
+                # Keep the writer alive. Whether these rows committed is unknown, so their
+                # clients get "accepted" (202) rather than an error that invites a resend
+                logger.exception("ingest writer failed on a batch of %d rows", len(batch))
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_result(False)
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        outcomes = [None] * len(batch)
+        try:
+            insert_records(rows)
+            retry = []
+        except PartialInsertError as e:
+            # Other shards committed their rows; retrying those would store them twice
+            retry = e.failed
+        except Exception:
+            retry = range(len(rows))
+        # One bad row must not fail the rest of the batch: retry them one at a time
+        for i in retry:
+            try:
+                insert_records([rows[i]])
+            except Exception as e:
+                outcomes[i] = e
+
+        # Invalidate before acking, so a client that waited for the commit reads its own write
+        by_user = {}
+        for row, error in zip(rows, outcomes):
+            if error is None:
+                by_user.setdefault(row[0], []).append(row)
+        for user_id, user_rows in by_user.items():
+            self._after_commit(user_id, user_rows)
+
+        failed = sum(error is not None for error in outcomes)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["committed"] += len(batch) - failed
+            self._stats["failed"] += failed
+        for (_, future), error in zip(batch, outcomes):
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(True)
+            else:
+                future.set_exception(error)
+
+    def close(self):
+        """Flushes everything queued and stops the writer thread."""
+        with self._lock:
+            thread, q = self._thread, self._queue
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = None
+        q.put(self._STOP)
+        thread.join()
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(mode=self.mode, ack=self.ack,
+                     queued=self._queue.qsize() if self._queue is not None else 0,
+                     avg_batch=round(stats["committed"] / stats["batches"], 1) if stats["batches"] else 0.0)
+        return stats
+
+
+write_queue = WriteQueue()
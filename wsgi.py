@@ -0,0 +1,7 @@
+"""
+WSGI entry point: `gunicorn wsgi:app` (see Procfile). Importing app.py has no
+side effects; this module builds the one app each worker serves.
+"""
+from app import create_app
+
+app = create_app()